@@ -1,7 +1,14 @@
+import logging
+from collections import deque
 from enum import Enum
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Set, Tuple
 from dataclasses import dataclass
 
+# 接続を一意に識別するキー: (接続元モジュール, 接続元出力, 接続先モジュール, 接続先入力)
+ConnectionKey = Tuple[str, str, str, str]
+
+logger = logging.getLogger(__name__)
+
 
 class SignalType(Enum):
     """信号の種類"""
@@ -12,7 +19,7 @@ class SignalType(Enum):
     TRIGGER = "trigger"  # トリガー信号（瞬間的）
 
 
-@dataclass
+@dataclass(frozen=True, eq=False, slots=True)
 class Connection:
     """
     モジュール間の接続を表現するクラス
@@ -25,6 +32,11 @@ class Connection:
     signal_type: SignalType  # 信号の種類
     attenuation: float = 1.0  # 減衰率（0.0-1.0）
 
+    @property
+    def key(self) -> ConnectionKey:
+        """接続を一意に識別するキー"""
+        return (self.source_module, self.source_output, self.target_module, self.target_input)
+
     def __str__(self):
         return f"{self.source_module}.{self.source_output} -> {self.target_module}.{self.target_input} ({self.signal_type.value})"
 
@@ -35,9 +47,29 @@ class ConnectionManager:
     """
 
     def __init__(self):
-        self.connections: List[Connection] = []
+        self.connections: Dict[ConnectionKey, Connection] = {}  # 接続キー -> 接続
         self.modules: Dict[str, Any] = {}  # モジュール名 -> モジュールオブジェクト
 
+        # 検索用インデックス（connect/disconnect時に更新）
+        self._by_module: Dict[str, List[Connection]] = {}
+        self._by_input: Dict[Tuple[str, str], List[Connection]] = {}
+        self._by_output: Dict[Tuple[str, str], List[Connection]] = {}
+        self._inputs_connected_by_module: Dict[str, Set[str]] = {}  # モジュール名 -> 接続済み入力端子名
+
+        # 接続のトポロジカル順（トポロジー変更時にNoneへ戻し、次回更新時に再計算）
+        self._topo_order: Optional[List[Connection]] = None
+        # update_all_connections用の適用プラン（_topo_orderから構築）
+        # (接続先inputs, 接続先端子名, 接続元outputs, 接続元端子名, 接続キー, 減衰率 or None, 接続先の入力変更フック)
+        self._apply_plan: Optional[
+            List[Tuple[Dict[str, Any], str, Dict[str, Any], str, ConnectionKey, Optional[float], Callable]]
+        ] = None
+        # get_processing_stages用の処理ステージ（互いに依存しないモジュールのグループを上流から順に並べたもの）
+        self._stages: Optional[List[List[str]]] = None
+        # 接続キー -> (元信号, 減衰済み信号)。減衰ノードを毎回生成しないためのキャッシュ
+        self._attenuated_signals: Dict[ConnectionKey, Tuple[Any, Any]] = {}
+        # モジュール構成・接続が変わるたびに増える番号（外部で処理順などをキャッシュする場合の有効性判定用）
+        self.version = 0
+
     def register_module(self, module_name: str, module_obj: Any):
         """
         モジュールを登録
@@ -47,7 +79,8 @@ class ConnectionManager:
             module_obj: モジュールオブジェクト
         """
         self.modules[module_name] = module_obj
-        print(f"Registered module: {module_name}")
+        self._invalidate_schedule()
+        logger.info("Registered module: %s", module_name)
 
     def connect(
         self,
@@ -74,11 +107,11 @@ class ConnectionManager:
         """
         # モジュールの存在確認
         if source_module not in self.modules:
-            print(f"Error: Source module '{source_module}' not found")
+            logger.error("Source module '%s' not found", source_module)
             return False
 
         if target_module not in self.modules:
-            print(f"Error: Target module '{target_module}' not found")
+            logger.error("Target module '%s' not found", target_module)
             return False
 
         source_mod = self.modules[source_module]
@@ -86,18 +119,18 @@ class ConnectionManager:
 
         # 出力端子の存在確認
         if source_output not in source_mod.outputs:
-            print(f"Error: Output '{source_output}' not found in {source_module}")
+            logger.error("Output '%s' not found in %s", source_output, source_module)
             return False
 
         # 入力端子の存在確認
         if target_input not in target_mod.inputs:
-            print(f"Error: Input '{target_input}' not found in {target_module}")
+            logger.error("Input '%s' not found in %s", target_input, target_module)
             return False
 
         # 既存の接続を確認（重複チェック）
         existing = self.find_connection(source_module, source_output, target_module, target_input)
         if existing:
-            print(f"Warning: Connection already exists: {existing}")
+            logger.warning("Connection already exists: %s", existing)
             return False
 
         # 新しい接続を作成
@@ -110,12 +143,14 @@ class ConnectionManager:
             attenuation=attenuation,
         )
 
-        self.connections.append(connection)
+        self.connections[connection.key] = connection
+        self._index_connection(connection)
+        self._invalidate_schedule()
 
         # 実際の接続処理
         self._apply_connection(connection)
 
-        print(f"Connected: {connection}")
+        logger.info("Connected: %s", connection)
         return True
 
     def disconnect(self, source_module: str, source_output: str, target_module: str, target_input: str) -> bool:
@@ -133,13 +168,16 @@ class ConnectionManager:
         """
         connection = self.find_connection(source_module, source_output, target_module, target_input)
         if not connection:
-            print(f"Error: Connection not found")
+            logger.error("Connection not found")
             return False
 
-        self.connections.remove(connection)
+        del self.connections[connection.key]
+        self._unindex_connection(connection)
+        self._attenuated_signals.pop(connection.key, None)
+        self._invalidate_schedule()
         self._remove_connection(connection)
 
-        print(f"Disconnected: {connection}")
+        logger.info("Disconnected: %s", connection)
         return True
 
     def find_connection(
@@ -148,42 +186,203 @@ class ConnectionManager:
         """
         指定された接続を検索
         """
-        for conn in self.connections:
-            if (
-                conn.source_module == source_module
-                and conn.source_output == source_output
-                and conn.target_module == target_module
-                and conn.target_input == target_input
-            ):
-                return conn
-        return None
+        return self.connections.get((source_module, source_output, target_module, target_input))
 
     def get_connections_for_module(self, module_name: str) -> List[Connection]:
         """
         指定されたモジュールに関連する接続を取得
         """
-        return [
-            conn for conn in self.connections if conn.source_module == module_name or conn.target_module == module_name
-        ]
+        return list(self._by_module.get(module_name, ()))
 
     def get_input_connections(self, module_name: str, input_name: str) -> List[Connection]:
         """
         指定された入力端子への接続を取得
         """
-        return [
-            conn for conn in self.connections if conn.target_module == module_name and conn.target_input == input_name
-        ]
+        return list(self._by_input.get((module_name, input_name), ()))
 
     def get_output_connections(self, module_name: str, output_name: str) -> List[Connection]:
         """
         指定された出力端子からの接続を取得
         """
+        return list(self._by_output.get((module_name, output_name), ()))
+
+    def get_connected_input_names(self, module_name: str) -> Set[str]:
+        """
+        指定されたモジュールの接続されている入力端子名を取得
+        """
+        return set(self._inputs_connected_by_module.get(module_name, ()))
+
+    def _index_connection(self, connection: Connection):
+        """
+        接続を検索用インデックスに登録
+        """
+        self._by_module.setdefault(connection.source_module, []).append(connection)
+        if connection.target_module != connection.source_module:
+            self._by_module.setdefault(connection.target_module, []).append(connection)
+        self._by_input.setdefault((connection.target_module, connection.target_input), []).append(connection)
+        self._by_output.setdefault((connection.source_module, connection.source_output), []).append(connection)
+        self._inputs_connected_by_module.setdefault(connection.target_module, set()).add(connection.target_input)
+
+    def _unindex_connection(self, connection: Connection):
+        """
+        接続を検索用インデックスから削除
+        """
+        for index, index_key in (
+            (self._by_module, connection.source_module),
+            (self._by_module, connection.target_module),
+            (self._by_input, (connection.target_module, connection.target_input)),
+            (self._by_output, (connection.source_module, connection.source_output)),
+        ):
+            bucket = index.get(index_key)
+            if bucket is None:
+                continue
+            bucket[:] = [conn for conn in bucket if conn is not connection]
+            if not bucket:
+                del index[index_key]
+
+        # 同じ入力端子への接続が残っていなければ接続済み入力から外す
+        if (connection.target_module, connection.target_input) not in self._by_input:
+            connected_inputs = self._inputs_connected_by_module.get(connection.target_module)
+            if connected_inputs is not None:
+                connected_inputs.discard(connection.target_input)
+                if not connected_inputs:
+                    del self._inputs_connected_by_module[connection.target_module]
+
+    def _get_attenuated_signal(self, key: ConnectionKey, source_signal: Any, attenuation: float) -> Any:
+        """
+        減衰済み信号を取得（元信号が変わらない限りキャッシュを再利用）
+        """
+        cached = self._attenuated_signals.get(key)
+        if cached is not None and cached[0] is source_signal:
+            return cached[1]
+
+        # pyoオブジェクトに減衰を適用
+        attenuated_signal = source_signal * attenuation
+        self._attenuated_signals[key] = (source_signal, attenuated_signal)
+        return attenuated_signal
+
+    def _invalidate_schedule(self):
+        """
+        トポロジカル順と適用プランのキャッシュを破棄
+        """
+        self._topo_order = None
+        self._apply_plan = None
+        self._stages = None
+        self.version += 1
+
+    def _build_topo_order(self) -> List[Connection]:
+        """
+        接続元モジュールのトポロジカル順（Kahnのアルゴリズム）で接続を並べる
+        フィードバック接続で循環がある場合、残りのモジュールは登録順で後ろに追加
+        """
+        # モジュール -> 下流モジュール（挿入順を保つためdictを順序付き集合として使用）
+        downstream: Dict[str, Dict[str, None]] = {}
+        in_degree: Dict[str, int] = {}
+        for conn in self.connections.values():
+            in_degree.setdefault(conn.source_module, 0)
+            in_degree.setdefault(conn.target_module, 0)
+            if conn.source_module == conn.target_module:
+                continue
+            targets = downstream.setdefault(conn.source_module, {})
+            if conn.target_module not in targets:
+                targets[conn.target_module] = None
+                in_degree[conn.target_module] += 1
+
+        queue = deque(module_name for module_name, degree in in_degree.items() if degree == 0)
+        module_order: List[str] = []
+        while queue:
+            module_name = queue.popleft()
+            module_order.append(module_name)
+            for target in downstream.get(module_name, ()):
+                in_degree[target] -= 1
+                if in_degree[target] == 0:
+                    queue.append(target)
+
+        if len(module_order) < len(in_degree):
+            ordered = set(module_order)
+            module_order.extend(module_name for module_name in in_degree if module_name not in ordered)
+
+        # 接続元モジュールごとにまとめて出力
         return [
             conn
-            for conn in self.connections
-            if conn.source_module == module_name and conn.source_output == output_name
+            for module_name in module_order
+            for conn in self._by_module.get(module_name, ())
+            if conn.source_module == module_name
         ]
 
+    def _build_stages(self) -> List[List[str]]:
+        """
+        登録済みモジュールを依存関係の段（Kahnのアルゴリズムのレベル）ごとにまとめる
+        同じ段のモジュール同士は接続されていないため、段の中の処理順は問わない
+        循環があるモジュールは最後の段にまとめて登録順で追加
+        """
+        downstream: Dict[str, Set[str]] = {}
+        in_degree: Dict[str, int] = dict.fromkeys(self.modules, 0)
+        for conn in self.connections.values():
+            if conn.source_module == conn.target_module:
+                continue
+            if conn.source_module not in in_degree or conn.target_module not in in_degree:
+                continue
+            targets = downstream.setdefault(conn.source_module, set())
+            if conn.target_module not in targets:
+                targets.add(conn.target_module)
+                in_degree[conn.target_module] += 1
+
+        stages: List[List[str]] = []
+        stage = [module_name for module_name, degree in in_degree.items() if degree == 0]
+        placed = 0
+        while stage:
+            stages.append(stage)
+            placed += len(stage)
+            next_stage: Set[str] = set()
+            for module_name in stage:
+                for target in downstream.get(module_name, ()):
+                    in_degree[target] -= 1
+                    if in_degree[target] == 0:
+                        next_stage.add(target)
+            # 登録順を保つ
+            stage = [module_name for module_name in in_degree if module_name in next_stage]
+
+        if placed < len(in_degree):
+            staged = {module_name for stage in stages for module_name in stage}
+            stages.append([module_name for module_name in in_degree if module_name not in staged])
+        return stages
+
+    def get_processing_stages(self) -> List[List[str]]:
+        """
+        モジュール名を処理ステージごとに取得（上流のステージから順）
+        """
+        if self._stages is None:
+            self._stages = self._build_stages()
+        return [list(stage) for stage in self._stages]
+
+    def _build_apply_plan(self):
+        """
+        update_all_connections用の適用プランをトポロジカル順で構築
+        """
+        if self._topo_order is None:
+            self._topo_order = self._build_topo_order()
+
+        plan = []
+        for connection in self._topo_order:
+            source_mod = self.modules.get(connection.source_module)
+            target_mod = self.modules.get(connection.target_module)
+            if source_mod is None or target_mod is None:
+                continue
+            attenuation = connection.attenuation if connection.attenuation != 1.0 else None
+            plan.append(
+                (
+                    target_mod.inputs,
+                    connection.target_input,
+                    source_mod.outputs,
+                    connection.source_output,
+                    connection.key,
+                    attenuation,
+                    target_mod.on_input_connected,
+                )
+            )
+        self._apply_plan = plan
+
     def _apply_connection(self, connection: Connection):
         """
         実際の接続処理を実行
@@ -196,11 +395,11 @@ class ConnectionManager:
 
         # 減衰を適用
         if connection.attenuation != 1.0 and source_signal is not None:
-            # pyoオブジェクトに減衰を適用
-            attenuated_signal = source_signal * connection.attenuation
-            target_mod.inputs[connection.target_input] = attenuated_signal
-        else:
-            target_mod.inputs[connection.target_input] = source_signal
+            source_signal = self._get_attenuated_signal(connection.key, source_signal, connection.attenuation)
+        target_mod.inputs[connection.target_input] = source_signal
+
+        # 接続先モジュールに入力の変更を通知
+        target_mod.on_input_connected(connection.target_input, source_signal)
 
     def _remove_connection(self, connection: Connection):
         """
@@ -209,27 +408,54 @@ class ConnectionManager:
         target_mod = self.modules[connection.target_module]
         target_mod.inputs[connection.target_input] = None
 
+        # 接続先モジュールに切断を通知
+        target_mod.on_input_disconnected(connection.target_input)
+
     def update_all_connections(self):
         """
-        すべての接続を更新
+        すべての接続を更新（上流モジュールからのトポロジカル順）
+        入力の値が変わった場合のみ書き込み、接続先モジュールに通知する
         """
-        for connection in self.connections:
-            self._apply_connection(connection)
+        if self._apply_plan is None:
+            self._build_apply_plan()
+
+        for (
+            target_inputs,
+            target_input,
+            source_outputs,
+            source_output,
+            key,
+            attenuation,
+            on_input_connected,
+        ) in self._apply_plan:
+            source_signal = source_outputs[source_output]
+            if attenuation is not None and source_signal is not None:
+                source_signal = self._get_attenuated_signal(key, source_signal, attenuation)
+            # pyoオブジェクトの==は比較オブジェクトを返すため同一性で判定
+            if target_inputs.get(target_input) is not source_signal:
+                target_inputs[target_input] = source_signal
+                on_input_connected(target_input, source_signal)
 
     def get_all_connections(self) -> List[Connection]:
         """
         すべての接続を取得
         """
-        return self.connections.copy()
+        return list(self.connections.values())
 
     def clear_all_connections(self):
         """
         すべての接続をクリア
         """
-        for connection in self.connections:
+        for connection in self.connections.values():
             self._remove_connection(connection)
         self.connections.clear()
-        print("All connections cleared")
+        self._by_module.clear()
+        self._by_input.clear()
+        self._by_output.clear()
+        self._inputs_connected_by_module.clear()
+        self._attenuated_signals.clear()
+        self._invalidate_schedule()
+        logger.info("All connections cleared")
 
     def print_connections(self):
         """
@@ -240,7 +466,7 @@ class ConnectionManager:
             return
 
         print("Current connections:")
-        for i, conn in enumerate(self.connections, 1):
+        for i, conn in enumerate(self.connections.values(), 1):
             print(f"  {i}. {conn}")
 
     def validate_connections(self) -> List[str]:
@@ -251,24 +477,27 @@ class ConnectionManager:
             エラーメッセージのリスト
         """
         errors = []
-
-        for conn in self.connections:
-            # モジュールの存在確認
-            if conn.source_module not in self.modules:
-                errors.append(f"Source module '{conn.source_module}' not found")
-
-            if conn.target_module not in self.modules:
-                errors.append(f"Target module '{conn.target_module}' not found")
-
-            # 端子の存在確認
-            if conn.source_module in self.modules:
-                source_mod = self.modules[conn.source_module]
-                if conn.source_output not in source_mod.outputs:
-                    errors.append(f"Output '{conn.source_output}' not found in {conn.source_module}")
-
-            if conn.target_module in self.modules:
-                target_mod = self.modules[conn.target_module]
-                if conn.target_input not in target_mod.inputs:
-                    errors.append(f"Input '{conn.target_input}' not found in {conn.target_module}")
+        missing_modules = set()
+
+        # 接続ごとではなく、使用されている端子ごとに一度だけチェック
+        for (module_name, output_name), conns in self._by_output.items():
+            source_mod = self.modules.get(module_name)
+            if source_mod is None:
+                if module_name not in missing_modules:
+                    missing_modules.add(module_name)
+                    errors.append(f"Source module '{module_name}' not found")
+            elif output_name not in source_mod.outputs:
+                used_by = ", ".join(str(conn) for conn in conns)
+                errors.append(f"Output '{output_name}' not found in {module_name} (used by: {used_by})")
+
+        for (module_name, input_name), conns in self._by_input.items():
+            target_mod = self.modules.get(module_name)
+            if target_mod is None:
+                if module_name not in missing_modules:
+                    missing_modules.add(module_name)
+                    errors.append(f"Target module '{module_name}' not found")
+            elif input_name not in target_mod.inputs:
+                used_by = ", ".join(str(conn) for conn in conns)
+                errors.append(f"Input '{input_name}' not found in {module_name} (used by: {used_by})")
 
         return errors
@@ -0,0 +1,75 @@
+"""
+DSP処理時間の計測プローブ
+環境変数DSP_PROBEが設定されている場合のみ、各モジュールのprocess()の実行時間を記録する
+"""
+
+import os
+import time
+import logging
+import functools
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict
+
+logger = logging.getLogger(__name__)
+
+# 計測の有効/無効（インポート時に一度だけ判定する）
+PROBE_ENABLED: bool = os.environ.get("DSP_PROBE", "").lower() not in ("", "0", "false", "no")
+
+# 関数ごとに保持する直近の計測数（長時間の計測でもメモリが増え続けないようにする）
+HIST_SIZE: int = 4096
+
+# 関数名 -> 直近HIST_SIZE回の実行時間(ns)
+_HIST: Dict[str, Deque[int]] = defaultdict(lambda: deque(maxlen=HIST_SIZE))
+
+
+def dsp_probe(fn: Callable) -> Callable:
+    """
+    process()などの実行時間を記録するデコレーター
+    計測が無効な場合は関数をそのまま返すため、オーバーヘッドはありません。
+    """
+    if not PROBE_ENABLED:
+        return fn
+
+    samples = _HIST[fn.__qualname__]
+    perf_counter_ns = time.perf_counter_ns
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = perf_counter_ns()
+        result = fn(*args, **kwargs)
+        samples.append(perf_counter_ns() - start)
+        return result
+
+    return wrapper
+
+
+def dump_probe(reset: bool = False) -> Dict[str, Dict[str, float]]:
+    """
+    直近HIST_SIZE回の計測結果（計測数・平均・95パーセンタイル、単位はms）を返し、ログに出力します。
+
+    Args:
+        reset: Trueの場合、出力後に計測結果をクリア
+    """
+    stats: Dict[str, Dict[str, float]] = {}
+    for name, samples in _HIST.items():
+        if not samples:
+            continue
+        ordered = sorted(samples)
+        count = len(ordered)
+        stats[name] = {
+            "count": count,
+            "mean_ms": sum(ordered) / count / 1e6,
+            "p95_ms": ordered[min(count - 1, int(count * 0.95))] / 1e6,
+        }
+        logger.info(
+            "%s: count=%d mean=%.3fms p95=%.3fms",
+            name,
+            count,
+            stats[name]["mean_ms"],
+            stats[name]["p95_ms"],
+        )
+
+    if reset:
+        for samples in _HIST.values():
+            samples.clear()
+    return stats
@@ -1,22 +1,72 @@
 import time
-import sys
-import os
 import logging
-from typing import Dict, List, Any
+from typing import Any, Callable, Dict, List
 
-sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
-from src.connection import ConnectionManager
 from pyo import Sig
+from ..connection import ConnectionManager
 
 logger = logging.getLogger(__name__)
 
 
+def clip_value(value: float, min_val: float, max_val: float) -> float:
+    """指定された範囲内に数値をクリップします。"""
+    return min_val if value < min_val else (max_val if value > max_val else value)
+
+
+# 全モジュールで共有するpyoオブジェクト（無音信号・波形テーブルなど。最初に必要になった時点で作成）
+_SHARED: Dict[str, Any] = {}
+
+
+def get_shared(key: str, factory: Callable[[], Any]) -> Any:
+    """
+    keyに対応する共有pyoオブジェクトを返します。未作成の場合はfactory()で作成します。
+    複数のモジュールから参照されるため、各モジュールのpyo_objectsには含めず停止もしないでください。
+    """
+    obj = _SHARED.get(key)
+    if obj is None:
+        obj = _SHARED[key] = factory()
+    return obj
+
+
+def reset_shared():
+    """
+    共有pyoオブジェクトをすべて破棄します。
+    サーバーをshutdown()するとpyoオブジェクトはすべて無効になるため、サーバーを作り直す前に呼び出してください。
+    """
+    _SHARED.clear()
+
+
+def get_silence() -> Sig:
+    """
+    共有の無音信号Sig(0)を返します。
+    複数のモジュールから参照されるため、各モジュールのpyo_objectsには含めず停止もしないでください。
+    """
+    return get_shared("silence", lambda: Sig(0))
+
+
 class BaseModule:
     """
     モジュラーシンセの基本クラス
     すべてのモジュール（VCO, VCF, LFO, VCA, ENV）の基底クラス
     """
 
+    # 共通属性はスロットに格納（サブクラス独自の属性は従来通り__dict__に格納される）
+    __slots__ = (
+        "name",
+        "is_active",
+        "inputs",
+        "outputs",
+        "parameters",
+        "pyo_objects",
+        "fixed_outputs",
+        "created_at",
+        "update_count",
+        "last_update",
+        "_last_update_count",
+        "connection_manager",
+        "__weakref__",
+    )
+
     def __init__(self, name: str = "BaseModule"):
         self.name = name
         self.is_active = False
@@ -36,8 +86,12 @@ class BaseModule:
         # 固定出力オブジェクト管理
         self.fixed_outputs: Dict[str, Any] = {}
 
-        # 最後に更新された時刻
-        self.last_update = time.time()
+        # 作成時刻と更新回数（update()ごとに時刻を取得しないよう回数のみ数える）
+        self.created_at = time.time()
+        self.update_count = 0
+        # 最後に更新された時刻（get_info()で更新回数の変化から求める）
+        self.last_update = self.created_at
+        self._last_update_count = 0
 
     def add_input(self, name: str, default_value: Any = None):
         """
@@ -75,7 +129,8 @@ class BaseModule:
 
         # 接続を設定
         self.inputs[input_name] = source_module.outputs[output_name]
-        logger.info(f"Connected {source_module.name}.{output_name} to {self.name}.{input_name}")
+        self.on_input_connected(input_name, self.inputs[input_name])
+        logger.info("Connected %s.%s to %s.%s", source_module.name, output_name, self.name, input_name)
 
     def disconnect(self, input_name: str):
         """
@@ -86,7 +141,8 @@ class BaseModule:
         """
         if input_name in self.inputs:
             self.inputs[input_name] = None
-            logger.info(f"Disconnected {self.name}.{input_name}")
+            self.on_input_disconnected(input_name)
+            logger.info("Disconnected %s.%s", self.name, input_name)
 
     def get_input_value(self, input_name: str, default_value: Any = 0):
         """
@@ -99,10 +155,8 @@ class BaseModule:
         Returns:
             入力値（接続がない場合はdefault_value）
         """
-        if input_name not in self.inputs:
-            return default_value
-
-        input_value = self.inputs[input_name]
+        # 未定義の端子も未接続の端子もNoneになるため、辞書の参照は1回で済ませる
+        input_value = self.inputs.get(input_name)
         if input_value is None:
             return default_value
 
@@ -117,7 +171,7 @@ class BaseModule:
             value: 設定値
         """
         self.parameters[param_name] = value
-        logger.info(f"Set {self.name}.{param_name} = {value}")
+        logger.info("Set %s.%s = %s", self.name, param_name, value)
 
     def get_parameter(self, param_name: str, default_value: Any = 0):
         """
@@ -139,7 +193,7 @@ class BaseModule:
         if not self.is_active:
             self.is_active = True
             self._initialize()
-            logger.info(f"{self.name} started")
+            logger.info("%s started", self.name)
 
     def stop(self):
         """
@@ -148,7 +202,7 @@ class BaseModule:
         if self.is_active:
             self.is_active = False
             self._cleanup()
-            logger.info(f"{self.name} stopped")
+            logger.info("%s stopped", self.name)
 
     def set_connection_manager(self, connection_manager: ConnectionManager):
         """接続マネージャーを設定"""
@@ -159,12 +213,27 @@ class BaseModule:
         if not hasattr(self, "connection_manager"):
             return []
 
-        connected = []
-        for input_name in self.inputs:
-            connections = self.connection_manager.get_input_connections(self.name, input_name)
-            if connections:
-                connected.append(input_name)
-        return connected
+        connected = self.connection_manager.get_connected_input_names(self.name)
+        return [input_name for input_name in self.inputs if input_name in connected]
+
+    def on_input_connected(self, input_name: str, value: Any):
+        """
+        入力端子に信号が接続された（または接続元の信号が変わった）ときに呼ばれるフック（子クラスでオーバーライド）
+
+        Args:
+            input_name: 入力端子名
+            value: 新しい入力値
+        """
+        pass
+
+    def on_input_disconnected(self, input_name: str):
+        """
+        入力端子の接続が切断されたときに呼ばれるフック（子クラスでオーバーライド）
+
+        Args:
+            input_name: 入力端子名
+        """
+        pass
 
     def _initialize(self):
         """
@@ -192,7 +261,7 @@ class BaseModule:
         """
         if self.is_active:
             self.process()
-            self.last_update = time.time()
+            self.update_count += 1
 
     def create_fixed_output(self, port_name: str, initial_value=0):
         """
@@ -210,7 +279,7 @@ class BaseModule:
             self.fixed_outputs[port_name] = fixed_output
             self.outputs[port_name] = fixed_output
             self.pyo_objects.append(fixed_output)
-            logger.info(f"{self.name} created fixed output: {port_name}")
+            logger.info("%s created fixed output: %s", self.name, port_name)
         return self.fixed_outputs[port_name]
 
     def update_fixed_output(self, port_name: str, new_value, multiplier=None):
@@ -226,9 +295,9 @@ class BaseModule:
             self.fixed_outputs[port_name].setValue(new_value)
             if multiplier is not None:
                 self.fixed_outputs[port_name].setMul(multiplier)
-            logger.info(f"{self.name} updated fixed output: {port_name}")
+            logger.info("%s updated fixed output: %s", self.name, port_name)
         else:
-            logger.warning(f"{self.name} fixed output not found: {port_name}")
+            logger.warning("%s fixed output not found: %s", self.name, port_name)
 
     def get_info(self) -> Dict[str, Any]:
         """
@@ -237,6 +306,11 @@ class BaseModule:
         Returns:
             モジュール情報の辞書
         """
+        # 前回の呼び出しから更新されていれば、最後の更新時刻を現在時刻とする
+        if self.update_count != self._last_update_count:
+            self.last_update = time.time()
+            self._last_update_count = self.update_count
+
         return {
             "name": self.name,
             "is_active": self.is_active,
@@ -244,6 +318,8 @@ class BaseModule:
             "outputs": list(self.outputs.keys()),
             "parameters": self.parameters,
             "last_update": self.last_update,
+            "created_at": self.created_at,
+            "update_count": self.update_count,
         }
 
     def __str__(self) -> str:
@@ -3,14 +3,11 @@ CV演算モジュール
 2つのCV信号を数学的に演算
 """
 
-import sys
-import os
 import logging
 from typing import Dict, Any
 from pyo import Sig
-
-sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
-from src.modules.base_module import BaseModule
+from .base_module import BaseModule
+from ._probe import dsp_probe
 
 logger = logging.getLogger(__name__)
 
@@ -38,53 +35,56 @@ class CVMath(BaseModule):
 
     def start(self):
         """pyoオブジェクトの初期化"""
+        # 入力・スケール・オフセット用のSigは一度だけ作成し、以降はsetValueで更新する
+        self.sig_a = Sig(0)
+        self.sig_b = Sig(0)
+        self.scale_sig = Sig(self.parameters["scale"])
+        self.offset_sig = Sig(self.parameters["offset"])
+        self.pyo_objects.extend([self.sig_a, self.sig_b, self.scale_sig, self.offset_sig])
+
         # 演算結果を保存するための変数
         self.current_result = None
+        self._built_operation = None
+
+        # 前回Sigに設定した入力（同一なら再設定しない）
+        self._last_a = None
+        self._last_b = None
+
+        # 固定出力オブジェクトを作成（下流からは常に同じオブジェクトに見える）
+        self.create_fixed_output("output", 0)
 
         self.is_active = True
-        logger.info(f"{self.name} started with operation: {self.parameters['operation']}")
+        logger.info("%s started with operation: %s", self.name, self.parameters["operation"])
 
         # 初期出力を構築
+        self._update_inputs()
         self._rebuild_output()
 
-    def _rebuild_output(self):
-        """演算結果のpyoオブジェクトを再構築"""
-        if not self.is_active:
-            logger.warning(f"{self.name} _rebuild_output called but module is not active")
-            return
-
-        # 古いオブジェクトを削除
-        if self.current_result is not None and self.current_result in self.pyo_objects:
-            self.pyo_objects.remove(self.current_result)
-            logger.debug(f"{self.name} removed old result from pyo_objects")
-
-        # 入力値を取得
+    def _update_inputs(self):
+        """入力値を入力用Sigに反映"""
         input_a = self.get_input_value("input_a")
         input_b = self.get_input_value("input_b")
 
-        logger.info(
-            f"{self.name} rebuilding output: input_a={input_a} (type: {type(input_a)}), input_b={input_b} (type: {type(input_b)})"
-        )
-
-        # 入力値をpyoオブジェクトに変換
-        if hasattr(input_a, "out"):  # pyoオブジェクトの場合
-            sig_a = input_a
-        else:  # 数値の場合
-            sig_a = Sig(input_a)
-            self.pyo_objects.append(sig_a)
+        # pyoオブジェクトの==は比較オブジェクトを返すため同一性で判定
+        if input_a is not self._last_a:
+            self.sig_a.setValue(input_a)
+            self._last_a = input_a
+        if input_b is not self._last_b:
+            self.sig_b.setValue(input_b)
+            self._last_b = input_b
 
-        if hasattr(input_b, "out"):  # pyoオブジェクトの場合
-            sig_b = input_b
-        else:  # 数値の場合
-            sig_b = Sig(input_b)
-            self.pyo_objects.append(sig_b)
+    def _rebuild_output(self):
+        """演算結果のpyoオブジェクトを再構築（演算タイプが変わった場合のみ）"""
+        if not self.is_active:
+            logger.warning("%s _rebuild_output called but module is not active", self.name)
+            return
 
-        # 演算実行
         operation = self.parameters["operation"]
-        scale = self.parameters["scale"]
-        offset = self.parameters["offset"]
+        if operation == self._built_operation:
+            return
 
-        logger.info(f"{self.name} rebuilding with operation={operation}, scale={scale}, offset={offset}")
+        sig_a = self.sig_a
+        sig_b = self.sig_b
 
         if operation == "add":
             result = sig_a + sig_b
@@ -98,49 +98,58 @@ class CVMath(BaseModule):
         else:
             result = sig_a
 
-        # スケールとオフセット適用
-        self.current_result = result * scale + offset
-        self.pyo_objects.append(self.current_result)
-        self.outputs["output"] = self.current_result
+        # スケールとオフセット適用（値はSig経由で更新されるため再構築不要）
+        # 演算結果はpyo_objectsではなくcurrent_resultで保持し、リストの走査を避ける
+        self.current_result = result * self.scale_sig + self.offset_sig
+        self.update_fixed_output("output", self.current_result)
+        self._built_operation = operation
 
-        logger.info(
-            f"{self.name} rebuilt output successfully: operation={operation}, result_object={type(self.current_result)}"
-        )
+        logger.info("%s rebuilt output: operation=%s", self.name, operation)
 
+    @dsp_probe
     def process(self):
         """CV信号を演算"""
         if not self.is_active:
-            logger.warning(f"{self.name} process called but module is not active")
+            logger.warning("%s process called but module is not active", self.name)
             return
 
-        logger.info(f"{self.name} process called - rebuilding output")
+        self._update_inputs()
         self._rebuild_output()
-        logger.info(f"{self.name} process completed")
 
     def set_operation(self, operation: str):
         """演算タイプを設定"""
         valid_ops = ["add", "subtract", "multiply", "divide"]
         if operation in valid_ops:
-            logger.info(f"{self.name} changing operation from {self.parameters['operation']} to {operation}")
+            logger.info("%s changing operation from %s to %s", self.name, self.parameters["operation"], operation)
             self.parameters["operation"] = operation
             self._rebuild_output()
-            logger.info(f"{self.name} operation set to {operation} and output rebuilt")
+            logger.info("%s operation set to %s and output rebuilt", self.name, operation)
         else:
-            logger.warning(f"{self.name} invalid operation: {operation}")
+            logger.warning("%s invalid operation: %s", self.name, operation)
 
     def set_offset(self, offset: float):
         """オフセットを設定"""
-        logger.info(f"{self.name} changing offset from {self.parameters['offset']} to {offset}")
+        logger.info("%s changing offset from %s to %s", self.name, self.parameters["offset"], offset)
         self.parameters["offset"] = offset
-        self._rebuild_output()
-        logger.info(f"{self.name} offset set to {offset} and output rebuilt")
+        if self.is_active:
+            self.offset_sig.setValue(offset)
+        logger.info("%s offset set to %s", self.name, offset)
 
     def set_scale(self, scale: float):
         """スケールを設定"""
-        logger.info(f"{self.name} changing scale from {self.parameters['scale']} to {scale}")
+        logger.info("%s changing scale from %s to %s", self.name, self.parameters["scale"], scale)
         self.parameters["scale"] = scale
-        self._rebuild_output()
-        logger.info(f"{self.name} scale set to {scale} and output rebuilt")
+        if self.is_active:
+            self.scale_sig.setValue(scale)
+        logger.info("%s scale set to %s", self.name, scale)
+
+    def _cleanup(self):
+        """モジュール停止時のクリーンアップ処理"""
+        super()._cleanup()
+        if self.current_result is not None:
+            self.current_result.stop()
+            self.current_result = None
+        self._built_operation = None
 
     def get_info(self) -> Dict[str, Any]:
         """モジュール情報の取得"""
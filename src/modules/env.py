@@ -1,11 +1,15 @@
-import random
 import logging
-from typing import Tuple
-from pyo import Adsr, Sig, PyoObject
+from typing import Any, Callable, Dict, Tuple
+import numpy as np
+from pyo import Adsr, Sig, Thresh, TrigFunc
 from .base_module import BaseModule
+from ._probe import dsp_probe
 
 logger = logging.getLogger(__name__)
 
+# randomize_parameters用の乱数生成器（全パラメータを1回の呼び出しでまとめて生成）
+_RNG = np.random.default_rng()
+
 
 class ENV(BaseModule):
     """
@@ -22,6 +26,9 @@ class ENV(BaseModule):
     DURATION_RANGE: Tuple[float, float] = (0.0, 20.0)
 
     def __init__(self, name: str = "ENV"):
+        # ADSRパラメータが変更されたかどうか（set_parameterより先に用意する）
+        self._params_dirty = True
+
         super().__init__(name)
 
         # --- パラメータの初期化 ---
@@ -39,6 +46,13 @@ class ENV(BaseModule):
         # --- pyoオブジェクトと内部状態の初期化 ---
         self.envelope: Adsr | None = None
         self.gate_signal: Sig | None = None
+        self.gate_on: Thresh | None = None
+        self.gate_off: Thresh | None = None
+        self._gate_triggers: Tuple[TrigFunc, ...] = ()
+        self._last_gate_input: Any = None
+        self._envelope_setters: Tuple[Tuple[str, Callable], ...] = ()
+        # 最後にAdsrへ適用したADSRパラメータ（変化がなければsetterを呼ばない）
+        self._applied_params: Dict[str, Any] = {}
 
     def _initialize(self):
         """
@@ -53,47 +67,65 @@ class ENV(BaseModule):
             dur=self.get_parameter("duration"),
             mul=1.0,
         )
-        # The gate signal will be connected in the process method
 
-        self.pyo_objects = [self.envelope, self.gate_signal]
+        # ゲート信号の立ち上がりでplay()、立ち下がりでstop()（リリース開始）を呼び出す
+        # 遷移の検出はpyo側で行うため、process()ごとのplay/stop呼び出しは不要
+        self.gate_on = Thresh(self.gate_signal, threshold=0.5, dir=0)
+        self.gate_off = Thresh(self.gate_signal, threshold=0.5, dir=1)
+        self._gate_triggers = (
+            TrigFunc(self.gate_on, self.envelope.play),
+            TrigFunc(self.gate_off, self.envelope.stop),
+        )
+        self._last_gate_input = None
+
+        self.pyo_objects = [self.envelope, self.gate_signal, self.gate_on, self.gate_off, *self._gate_triggers]
         self.outputs["cv_out"] = self.envelope
 
+        # 毎フレームの属性解決を避けるためsetterを事前にバインド
+        self._envelope_setters = (
+            ("attack", self.envelope.setAttack),
+            ("decay", self.envelope.setDecay),
+            ("sustain", self.envelope.setSustain),
+            ("release", self.envelope.setRelease),
+            ("duration", self.envelope.setDur),
+        )
+        # Adsrは現在のパラメータで作成済み
+        self._applied_params = {param_name: self.parameters[param_name] for param_name, _ in self._envelope_setters}
+        self._params_dirty = False
+
     def _update_envelope_params(self):
         """
         ADSRパラメータの変更をpyoオブジェクトに適用します。
+        パラメータが変更されていない場合は何もしません。
         """
-        if not self.envelope:
+        if not self._params_dirty or not self.envelope:
             return
 
-        self.envelope.setAttack(self.get_parameter("attack"))
-        self.envelope.setDecay(self.get_parameter("decay"))
-        self.envelope.setSustain(self.get_parameter("sustain"))
-        self.envelope.setRelease(self.get_parameter("release"))
-        self.envelope.setDur(self.get_parameter("duration"))
+        parameters = self.parameters
+        applied = self._applied_params
+        for param_name, setter in self._envelope_setters:
+            value = parameters[param_name]
+            if value != applied[param_name]:
+                setter(value)
+                applied[param_name] = value
+        self._params_dirty = False
 
     def _update_gate_routing(self):
         """
-        ゲート入力のルーティングを管理します。
+        ゲート入力をゲート信号に反映します。
+        数値・PyoObjectのどちらもSigの値として設定し、遷移はThreshで検出します。
         """
         if not self.envelope:
             return
 
         gate_input = self.get_input_value("gate_in")
 
-        if isinstance(gate_input, PyoObject):
-            # 外部からのPyoObjectで直接ゲートを制御
-            # pyoのAdsrは直接入力を受け取れないので、手動でトリガーを処理
-            # この実装は簡略化されており、実際のゲート処理は呼び出し側で行う
-            pass
-        else:
-            # 数値入力でゲートを制御
-            # 1.0以上でplay()、0.0以下でstop()を呼び出す
-            if isinstance(gate_input, (int, float)):
-                if gate_input > 0.5:
-                    self.envelope.play()
-                else:
-                    self.envelope.stop()
+        # 入力が変わった場合のみ更新（PyoObjectの==は比較オブジェクトを返すため同一性で判定）
+        if gate_input is not self._last_gate_input:
+            self.gate_signal.setValue(gate_input)
+            self._last_gate_input = gate_input
 
+    @dsp_probe
     def process(self):
         """
         モジュールのメイン処理。
@@ -111,39 +143,39 @@ class ENV(BaseModule):
 
     # --- パラメータ設定用メソッド ---
 
+    def set_parameter(self, param_name: str, value: Any):
+        super().set_parameter(param_name, value)
+        self._params_dirty = True
+
     def set_attack(self, time: float):
-        time = self._clip_value(time, *self.ATTACK_RANGE)
+        time = min(self.ATTACK_RANGE[1], max(self.ATTACK_RANGE[0], time))
         self.set_parameter("attack", time)
 
     def set_decay(self, time: float):
-        time = self._clip_value(time, *self.DECAY_RANGE)
+        time = min(self.DECAY_RANGE[1], max(self.DECAY_RANGE[0], time))
         self.set_parameter("decay", time)
 
     def set_sustain(self, level: float):
-        level = self._clip_value(level, *self.SUSTAIN_RANGE)
+        level = min(self.SUSTAIN_RANGE[1], max(self.SUSTAIN_RANGE[0], level))
         self.set_parameter("sustain", level)
 
     def set_release(self, time: float):
-        time = self._clip_value(time, *self.RELEASE_RANGE)
+        time = min(self.RELEASE_RANGE[1], max(self.RELEASE_RANGE[0], time))
         self.set_parameter("release", time)
 
     def set_duration(self, dur: float):
-        dur = self._clip_value(dur, *self.DURATION_RANGE)
+        dur = min(self.DURATION_RANGE[1], max(self.DURATION_RANGE[0], dur))
         self.set_parameter("duration", dur)
 
     # --- ユーティリティメソッド ---
 
-    def _clip_value(self, value: float, min_val: float, max_val: float) -> float:
-        """指定された範囲内に値をクリップします。"""
-        return max(min_val, min(max_val, value))
-
     def randomize_parameters(self):
         """モジュールのパラメータをランダムな値に設定します。"""
-        self.set_attack(random.uniform(0.01, 0.5))
-        self.set_decay(random.uniform(0.1, 0.8))
-        self.set_sustain(random.uniform(0.2, 0.8))
-        self.set_release(random.uniform(0.5, 3.0))
-        logger.info(f"{self.name} parameters randomized.")
+        # 乱数範囲はすべて各パラメータの許容範囲内なのでクリップ不要
+        attack, decay, sustain, release = _RNG.uniform([0.01, 0.1, 0.2, 0.5], [0.5, 0.8, 0.8, 3.0]).tolist()
+        self.parameters.update(attack=attack, decay=decay, sustain=sustain, release=release)
+        self._params_dirty = True
+        logger.info("%s parameters randomized.", self.name)
 
     def _cleanup(self):
         """モジュール停止時のクリーンアップ処理。"""
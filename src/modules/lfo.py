@@ -1,11 +1,15 @@
-import random
 import logging
-from typing import List, Tuple
+from typing import Any, Dict, List, Tuple
+import numpy as np
 from pyo import LFO as pyoLFO
-from .base_module import BaseModule
+from .base_module import BaseModule, clip_value
+from ._probe import dsp_probe
 
 logger = logging.getLogger(__name__)
 
+# randomize_parameters用の乱数生成器（全パラメータを1回の呼び出しでまとめて生成）
+_RNG = np.random.default_rng()
+
 
 class LFO(BaseModule):
     """
@@ -17,11 +21,32 @@ class LFO(BaseModule):
     # --- 定数の定義 ---
     WAVEFORMS: List[str] = ["sine", "saw_up", "saw_down", "square", "triangle", "pulse", "random"]
 
+    # 波形名 -> pyoのLFO type番号
+    WAVEFORM_TYPES: Dict[str, int] = {
+        "sine": 7,  # Sine
+        "saw_up": 0,  # Sawtooth Up
+        "saw_down": 1,  # Sawtooth Down
+        "square": 2,  # Square
+        "triangle": 3,  # Triangle
+        "pulse": 4,  # Pulse
+        "random": 6,  # Random
+    }
+
     # パラメータのデフォルト範囲
     FREQ_RANGE: Tuple[float, float] = (0.01, 100.0)
     AMP_RANGE: Tuple[float, float] = (0.0, 10.0)
     OFFSET_RANGE: Tuple[float, float] = (-5.0, 5.0)
 
+    # 毎フレーム参照するパラメータ -> 直接参照用の属性名（parametersは参照用として維持）
+    PARAM_ATTRS: Dict[str, str] = {
+        "freq": "_freq",
+        "amplitude": "_amp",
+        "offset": "_offset",
+        "sharpness": "_sharp",
+    }
+
+    __slots__ = ("lfo", "last_waveform", "_last_applied", "_freq", "_amp", "_offset", "_sharp")
+
     def __init__(self, name: str = "LFO", initial_freq: float = 1.0, waveform: str = "sine"):
         super().__init__(name)
 
@@ -42,6 +67,9 @@ class LFO(BaseModule):
         self.lfo: pyoLFO | None = None
         self.last_waveform: str = self.get_parameter("waveform")
 
+        # 最後にpyoオブジェクトへ適用した値（変化がなければsetterを呼ばない）
+        self._last_applied: Dict[str, float | None] = {"freq": None, "sharp": None, "mul": None, "add": None}
+
     def _initialize(self):
         """
         初期化処理 - pyoオブジェクトを作成し、参照を保持します。
@@ -51,16 +79,7 @@ class LFO(BaseModule):
 
     def _get_waveform_type(self, waveform_name: str) -> int:
         """波形名に対応するpyoのtype番号を返します。"""
-        type_map = {
-            "sine": 7,  # Sine
-            "saw_up": 0,  # Sawtooth Up
-            "saw_down": 1,  # Sawtooth Down
-            "square": 2,  # Square
-            "triangle": 3,  # Triangle
-            "pulse": 4,  # Pulse
-            "random": 6,  # Random
-        }
-        return type_map.get(waveform_name, 7)
+        return self.WAVEFORM_TYPES.get(waveform_name, 7)
 
     def _create_lfo(self):
         """
@@ -79,6 +98,14 @@ class LFO(BaseModule):
         self.outputs["cv_out"] = self.lfo
         self.last_waveform = waveform_str
 
+        # 新しいLFOは生成時の値を持つので、適用済みの値として記録
+        self._last_applied = {
+            "freq": self._freq,
+            "sharp": self._sharp,
+            "mul": self._amp,
+            "add": self._offset,
+        }
+
     def _update_lfo_params(self):
         """
         各種パラメータと入力値から、最終的なLFO設定を計算し、適用します。
@@ -86,22 +113,36 @@ class LFO(BaseModule):
         if not self.lfo:
             return
 
+        last_applied = self._last_applied
+
         # --- 周波数の計算 ---
-        base_freq = self.get_parameter("freq")
+        final_freq = self._freq
         freq_cv = self.get_input_value("freq_cv", 0)
-        cv_contribution = 0
-        if isinstance(freq_cv, (int, float)):
-            cv_contribution = freq_cv
-
-        final_freq = base_freq + cv_contribution
-        final_freq = self._clip_value(final_freq, *self.FREQ_RANGE)
-
-        # --- パラメータをpyoオブジェクトに適用 ---
-        self.lfo.setFreq(final_freq)
-        self.lfo.setSharp(self.get_parameter("sharpness"))
-        self.lfo.setMul(self.get_parameter("amplitude"))
-        self.lfo.setAdd(self.get_parameter("offset"))
-
+        if type(freq_cv) in (int, float):
+            final_freq += freq_cv
+        final_freq = clip_value(final_freq, *self.FREQ_RANGE)
+
+        # --- 変化したパラメータのみpyoオブジェクトに適用 ---
+        if final_freq != last_applied["freq"]:
+            self.lfo.setFreq(final_freq)
+            last_applied["freq"] = final_freq
+
+        sharpness = self._sharp
+        if sharpness != last_applied["sharp"]:
+            self.lfo.setSharp(sharpness)
+            last_applied["sharp"] = sharpness
+
+        amplitude = self._amp
+        if amplitude != last_applied["mul"]:
+            self.lfo.setMul(amplitude)
+            last_applied["mul"] = amplitude
+
+        offset = self._offset
+        if offset != last_applied["add"]:
+            self.lfo.setAdd(offset)
+            last_applied["add"] = offset
+
+    @dsp_probe
     def process(self):
         """
         モジュールのメイン処理。毎フレーム呼び出されることを想定しています。
@@ -125,38 +166,42 @@ class LFO(BaseModule):
 
     # --- パラメータ設定用メソッド ---
 
+    def set_parameter(self, param_name: str, value: Any):
+        super().set_parameter(param_name, value)
+        attr = self.PARAM_ATTRS.get(param_name)
+        if attr is not None:
+            setattr(self, attr, value)
+
     def set_frequency(self, freq: float):
-        freq = self._clip_value(freq, *self.FREQ_RANGE)
+        freq = clip_value(freq, *self.FREQ_RANGE)
         self.set_parameter("freq", freq)
 
     def set_waveform(self, waveform: str):
         if waveform in self.WAVEFORMS:
             self.set_parameter("waveform", waveform)
         else:
-            logger.warning(f"Unknown waveform '{waveform}', using 'sine'")
+            logger.warning("Unknown waveform '%s', using 'sine'", waveform)
             self.set_parameter("waveform", "sine")
 
     def set_amplitude(self, amp: float):
-        amp = self._clip_value(amp, *self.AMP_RANGE)
+        amp = clip_value(amp, *self.AMP_RANGE)
         self.set_parameter("amplitude", amp)
 
     def set_offset(self, offset: float):
-        offset = self._clip_value(offset, *self.OFFSET_RANGE)
+        offset = clip_value(offset, *self.OFFSET_RANGE)
         self.set_parameter("offset", offset)
 
     # --- ユーティリティメソッド ---
 
-    def _clip_value(self, value: float, min_val: float, max_val: float) -> float:
-        """指定された範囲内に値をクリップします。"""
-        return max(min_val, min(max_val, value))
-
     def randomize_parameters(self):
         """モジュールのパラメータをランダムな値に設定します。"""
-        self.set_frequency(random.uniform(0.1, 10))
-        self.set_waveform(random.choice(self.WAVEFORMS))
-        self.set_amplitude(random.uniform(0.5, 2.0))
-        self.set_offset(random.uniform(-1.0, 1.0))
-        logger.info(f"{self.name} parameters randomized.")
+        # 周波数・振幅・オフセット・波形選択用の値を一度に生成
+        freq, amp, offset, waveform_pos = _RNG.uniform([0.1, 0.5, -1.0, 0.0], [10.0, 2.0, 1.0, 1.0]).tolist()
+        self.set_frequency(freq)
+        self.set_waveform(self.WAVEFORMS[int(waveform_pos * len(self.WAVEFORMS))])
+        self.set_amplitude(amp)
+        self.set_offset(offset)
+        logger.info("%s parameters randomized.", self.name)
 
     def get_available_waveforms(self) -> List[str]:
         """利用可能な波形のリストを返します。"""
@@ -4,13 +4,11 @@
 """
 
 import sys
-import os
 import logging
 from typing import Dict, Any
-from pyo import Sig, Mix
-
-sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
-from src.modules.base_module import BaseModule
+from pyo import Sig, Mix, PyoObject
+from .base_module import BaseModule
+from ._probe import dsp_probe
 
 logger = logging.getLogger(__name__)
 
@@ -26,9 +24,16 @@ class Mixer(BaseModule):
 
         # 入力端子とレベル調整パラメータ
         self.num_inputs = inputs
-        for i in range(inputs):
-            self.add_input(f"input{i}", 0)
-            self.parameters[f"level{i}"] = 0.5  # 0.0-1.0
+        # 端子名・パラメータ名は毎回文字列を組み立てないよう事前に作成
+        self._input_keys = tuple(sys.intern(f"input{i}") for i in range(inputs))
+        self._level_keys = tuple(sys.intern(f"level{i}") for i in range(inputs))
+        # レベル名 -> 入力番号（set_parameterでのレベル変更をレベル配列に反映するため）
+        self._level_index = {level_key: i for i, level_key in enumerate(self._level_keys)}
+        # 各入力のレベル（process()ではparametersの辞書を引かずにこの配列を参照する）
+        self._levels = [0.5] * inputs
+        for input_key, level_key in zip(self._input_keys, self._level_keys):
+            self.add_input(input_key, 0)
+            self.parameters[level_key] = 0.5  # 0.0-1.0
 
         # 出力端子
         self.add_output("output")
@@ -41,69 +46,127 @@ class Mixer(BaseModule):
 
     def start(self):
         """pyoオブジェクトの初期化"""
-        # 各入力用のSigオブジェクト
+        # 各入力用のSigオブジェクト（接続された信号をsetValueで差し替える）
         self.input_sigs = []
+        # レベル調整済みの各入力（mulでレベルを設定）
+        self._scaled = []
         for i in range(self.num_inputs):
             sig = Sig(0)  # 初期値0
+            scaled = Sig(sig, mul=0)
             self.input_sigs.append(sig)
-            self.pyo_objects.append(sig)
+            self._scaled.append(scaled)
+            self.pyo_objects.extend([sig, scaled])
+
+        # 混合出力は一度だけ作成し、以降はsetMulなどで更新する
+        self._mix = Mix(self._scaled, voices=1, mul=self.parameters["master_level"])
+        self.mixed_output = self._mix
+        self.pyo_objects.append(self._mix)
+        self.outputs["output"] = self._mix
 
-        # 固定出力オブジェクトを作成
-        self.create_fixed_output("output", 0)
+        # 前回入力用Sigに設定した信号（同一なら再設定しない）
+        self._last_inputs = [None] * self.num_inputs
+        # 最後に各入力・混合出力へ設定したmul（変化がなければsetMulを呼ばない）
+        self._applied_muls = [0.0] * self.num_inputs
+        self._applied_master = self.parameters["master_level"]
 
         self.is_active = True
-        logger.info(f"{self.name} started with {self.num_inputs} inputs")
+        logger.info("%s started with %d inputs", self.name, self.num_inputs)
 
+    @dsp_probe
     def process(self):
-        """入力信号を混合（固定出力オブジェクト版）"""
+        """入力信号を混合（永続的なMixオブジェクトの値を更新）"""
         if not self.is_active:
-            logger.warning(f"{self.name} process() called but module is not active")
+            logger.warning("%s process() called but module is not active", self.name)
             return
 
-        logger.info(f"=== {self.name} process() start ===")
-        
-        # 接続されている入力を収集
-        active_inputs = []
-        for i in range(self.num_inputs):
-            input_val = self.get_input_value(f"input{i}")
-            level = self.parameters[f"level{i}"]
-            
-            if hasattr(input_val, "out") and input_val != 0 and level > 0:
-                # レベル調整して追加
-                scaled_input = Sig(input_val, mul=level)
-                active_inputs.append(scaled_input)
-                logger.info(f"{self.name} input{i} added (scaled by {level})")
-
-        if active_inputs:
-            # 新しい混合結果を作成
-            new_mixed = Mix(active_inputs, voices=1)
-            master_level = self.parameters["master_level"]
-            
-            # 固定出力オブジェクトの内容を更新
-            self.update_fixed_output("output", new_mixed, master_level)
-            logger.info(f"{self.name} updated fixed output with {len(active_inputs)} inputs")
-        else:
-            # 無音を出力（既存オブジェクトを更新）
-            self.update_fixed_output("output", 0)
-            logger.info(f"{self.name} set to silence via fixed output")
-
-        logger.info(f"=== {self.name} process() end ===")
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        if debug_enabled:
+            logger.debug("=== %s process() start ===", self.name)
+
+        active_count = 0
+        levels = self._levels
+        applied_muls = self._applied_muls
+        # 未接続の入力（None）はPyoObjectでないためミュート扱いになる。get_input_valueを経由せず直接参照する
+        inputs = self.inputs
+        for i, input_key in enumerate(self._input_keys):
+            input_val = inputs.get(input_key)
+            level = levels[i]
+
+            # PyoObjectの!=は比較オブジェクトを生成するため、型チェックのみで判定
+            if isinstance(input_val, PyoObject):
+                # レベル0でも信号は接続しておき、set_input_levelでmulを変えるだけで鳴らせるようにする
+                # pyoオブジェクトの==は比較オブジェクトを返すため同一性で判定
+                if input_val is not self._last_inputs[i]:
+                    self.input_sigs[i].setValue(input_val)
+                    self._last_inputs[i] = input_val
+                if level != applied_muls[i]:
+                    self._scaled[i].setMul(level)
+                    applied_muls[i] = level
+                if level > 0.0:
+                    active_count += 1
+                    if debug_enabled:
+                        logger.debug("%s input%d added (scaled by %s)", self.name, i, level)
+            else:
+                # 未接続の入力はミュートし、切断された信号への参照を外す
+                if applied_muls[i] != 0.0:
+                    self._scaled[i].setMul(0)
+                    applied_muls[i] = 0.0
+                if self._last_inputs[i] is not None:
+                    self.input_sigs[i].setValue(0)
+                    self._last_inputs[i] = None
+
+        self._apply_master(active_count > 0)
+        if debug_enabled:
+            logger.debug("%s updated mixed output with %d inputs", self.name, active_count)
+            logger.debug("=== %s process() end ===", self.name)
+
+    def set_parameter(self, param_name: str, value: Any):
+        super().set_parameter(param_name, value)
+        index = self._level_index.get(param_name)
+        if index is not None:
+            self._levels[index] = value
+
+    def _apply_master(self, has_active_input: bool):
+        """混合出力のmulを更新（有効な入力がなければ新しいオブジェクトを作らずmul=0でミュート）"""
+        master = self.parameters["master_level"] if has_active_input else 0.0
+        if master != self._applied_master:
+            self._mix.setMul(master)
+            self._applied_master = master
+
+    def _has_active_input(self) -> bool:
+        """接続済みでレベルが0より大きい入力があるか（process()で最後に反映した状態で判定）"""
+        return any(applied > 0.0 and last is not None for applied, last in zip(self._applied_muls, self._last_inputs))
 
     def set_input_level(self, input_index: int, level: float):
-        """入力レベルを設定"""
+        """
+        入力レベルを設定
+        接続済みの入力であれば、process()を呼ばなくても動作中のMixに即座に反映される
+        """
         if 0 <= input_index < self.num_inputs:
-            self.parameters[f"level{input_index}"] = max(0.0, min(1.0, level))
-            logger.info(f"{self.name} input{input_index} level set to {level}")
+            level = max(0.0, min(1.0, level))
+            self.parameters[self._level_keys[input_index]] = level
+            self._levels[input_index] = level
+            if self.is_active and self._last_inputs[input_index] is not None:
+                if level != self._applied_muls[input_index]:
+                    self._scaled[input_index].setMul(level)
+                    self._applied_muls[input_index] = level
+                self._apply_master(self._has_active_input())
+            logger.info("%s input%s level set to %s", self.name, input_index, level)
 
     def set_master_level(self, level: float):
-        """マスターレベルを設定"""
+        """
+        マスターレベルを設定
+        動作中であれば、process()を呼ばなくても混合出力に即座に反映される
+        """
         self.parameters["master_level"] = max(0.0, min(1.0, level))
-        logger.info(f"{self.name} master level set to {level}")
+        if self.is_active:
+            self._apply_master(self._has_active_input())
+        logger.info("%s master level set to %s", self.name, level)
 
     def get_info(self) -> Dict[str, Any]:
         """モジュール情報の取得"""
         info = super().get_info()
         info["num_inputs"] = self.num_inputs
-        info["input_levels"] = {f"level{i}": self.parameters[f"level{i}"] for i in range(self.num_inputs)}
+        info["input_levels"] = {level_key: self.parameters[level_key] for level_key in self._level_keys}
         info["master_level"] = self.parameters["master_level"]
         return info
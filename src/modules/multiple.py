@@ -3,13 +3,11 @@
 一つの入力信号を複数の出力に分岐する
 """
 
-import sys
-import os
 import logging
 from typing import Dict, Any
-
-sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
-from src.modules.base_module import BaseModule
+from pyo import Sig, PyoObject
+from .base_module import BaseModule
+from ._probe import dsp_probe
 
 logger = logging.getLogger(__name__)
 
@@ -28,31 +26,62 @@ class Multiple(BaseModule):
 
         # 出力端子（デフォルト4個）
         self.num_outputs = outputs
-        for i in range(outputs):
-            self.add_output(f"output{i}")
+        self._output_keys = tuple(f"output{i}" for i in range(outputs))
+        for key in self._output_keys:
+            self.add_output(key)
+
+        # 最後に分岐用Sigへ設定した入力信号（同一なら再設定しない）
+        self._last_input = None
+        # PyoObjectの入力を全出力へ分岐する共有Sig
+        self._hub = None
 
     def start(self):
         """pyoオブジェクトの初期化"""
+        # PyoObjectの入力は全出力で1つのSigを共有して分岐する（pyoでは1つの信号を複数の接続先から参照できる）
+        # 出力オブジェクトは入力が変わっても同じなので、接続先で再接続する必要がない
+        self._hub = Sig(0)
+        self.pyo_objects = [self._hub]
+        for key in self._output_keys:
+            self.outputs[key] = self._hub
+        self._last_input = None
+
         self.is_active = True
-        # 分岐は単純なコピーなので特別なpyoオブジェクトは不要
-        logger.info(f"{self.name} started with {self.num_outputs} outputs")
+        logger.info("%s started with %d outputs", self.name, self.num_outputs)
 
+    @dsp_probe
     def process(self):
-        """入力信号を全出力にコピー"""
+        """入力信号を全出力に分岐"""
         if not self.is_active:
             return
 
         input_signal = self.get_input_value("input")
-        
+
+        # 入力が前回と同じオブジェクトなら出力はそのまま
+        # （pyoオブジェクトの==は比較オブジェクトを返すため同一性で判定）
+        if input_signal is self._last_input:
+            return
+        self._last_input = input_signal
+
         # デバッグ情報を追加
-        logger.debug(f"{self.name} input signal: {input_signal}")
-        logger.debug(f"{self.name} input value type: {type(input_signal)}")
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        if debug_enabled:
+            logger.debug("%s input signal: %s", self.name, input_signal)
+            logger.debug("%s input value type: %s", self.name, type(input_signal))
+
+        if isinstance(input_signal, PyoObject):
+            # 分岐用Sigの入力を差し替える（全出力に反映される）
+            self._hub.setValue(input_signal)
+            output_value = self._hub
+        else:
+            # 数値などはそのまま全出力に渡す（数値のCVしか受け付けない接続先があるため）
+            output_value = input_signal
 
-        # 全出力に同じ信号を設定
-        for i in range(self.num_outputs):
-            self.outputs[f"output{i}"] = input_signal
+        outputs = self.outputs
+        for key in self._output_keys:
+            outputs[key] = output_value
 
-        logger.debug(f"{self.name} processed: input={input_signal}, outputs={self.num_outputs}")
+        if debug_enabled:
+            logger.debug("%s processed: input=%s, outputs=%d", self.name, input_signal, self.num_outputs)
 
     def get_info(self) -> Dict[str, Any]:
         """モジュール情報の取得"""
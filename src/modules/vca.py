@@ -1,12 +1,145 @@
-import random
 import math
+import struct
 import logging
-from typing import Dict, List, Tuple
-from pyo import Sig, Port, PyoObject
-from .base_module import BaseModule
+from array import array
+from enum import IntEnum
+from typing import Any, Callable, Dict, Tuple
+import numpy as np
+from pyo import Clip, Sig, Port, PyoObject
+from .base_module import BaseModule, clip_value
+from ._probe import dsp_probe
 
 logger = logging.getLogger(__name__)
 
+# randomize_parameters用の乱数生成器（全パラメータを1回の呼び出しでまとめて生成）
+_RNG = np.random.default_rng()
+
+
+def _to_float(value, default: float) -> float:
+    """数値に変換できる入力はfloatに、それ以外はdefaultにします。"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# 入力値の分類（未接続 / 数値 / PyoObject / その他）
+_KIND_NONE, _KIND_SCALAR, _KIND_PYO, _KIND_OTHER = range(4)
+
+# 型 -> 分類のキャッシュ（isinstanceによる判定は新しい型が来たときに一度だけ行う）
+_INPUT_KINDS: Dict[type, int] = {type(None): _KIND_NONE, int: _KIND_SCALAR, float: _KIND_SCALAR, bool: _KIND_SCALAR}
+
+
+def _input_kind(value) -> int:
+    """入力値の分類を返します。"""
+    kind = _INPUT_KINDS.get(type(value))
+    if kind is None:
+        if isinstance(value, PyoObject):
+            kind = _KIND_PYO
+        elif isinstance(value, (int, float)):
+            kind = _KIND_SCALAR
+        else:
+            kind = _KIND_OTHER
+        _INPUT_KINDS[type(value)] = kind
+    return kind
+
+
+def _scalar_input(value, default: float) -> float:
+    """入力値を数値として取り出します（未接続・変換できない値はdefault）。"""
+    kind = _input_kind(value)
+    if kind == _KIND_SCALAR:
+        return value
+    if kind == _KIND_NONE:
+        return default
+    return _to_float(value, default)
+
+
+# bfloat16への丸め用（float32のビット列の上位16ビットのみ残す）
+_F32 = struct.Struct("<f")
+_U32 = struct.Struct("<I")
+
+
+def _bf16_quant(value: float) -> float:
+    """
+    ゲイン値をbfloat16の精度（仮数部8ビット）に丸めます（最近接丸め）。
+    わずかな揺らぎでgain_signalを更新しないようにするためのものです。
+    """
+    bits = _U32.unpack(_F32.pack(value))[0]
+    return _F32.unpack(_U32.pack((bits + 0x8000) & 0xFFFF0000))[0]
+
+
+def _linear_curve(gain):
+    return gain
+
+
+def _exponential_curve(gain):
+    return gain * gain if gain > 0 else gain
+
+
+def _logarithmic_curve(gain):
+    return math.log2(gain + 1.0) if gain > 0 else gain
+
+
+# 数値用の対数カーブのテーブル（0.0〜最大ゲインの上限を1024分割し、線形補間で参照）
+_LOG2_LUT_SIZE = 1024
+_LOG2_LUT_MAX = 5.0  # VCA.MAX_GAIN_RANGEの上限
+_LOG2_LUT_SCALE = _LOG2_LUT_SIZE / _LOG2_LUT_MAX
+_LOG2_LUT = array("f", [math.log2(i / _LOG2_LUT_SCALE + 1.0) for i in range(_LOG2_LUT_SIZE + 1)])
+
+
+def _logarithmic_curve_lut(gain: float) -> float:
+    """数値用の対数カーブ。テーブル範囲外はmath.log2で計算します。"""
+    if gain <= 0.0:
+        return gain
+    if gain >= _LOG2_LUT_MAX:
+        return math.log2(gain + 1.0)
+    pos = gain * _LOG2_LUT_SCALE
+    i = int(pos)
+    lower = _LOG2_LUT[i]
+    return lower + (pos - i) * (_LOG2_LUT[i + 1] - lower)
+
+
+class ControlCurve(IntEnum):
+    """制御曲線のID（_CURVE_FNSのインデックスを兼ねる）"""
+
+    LINEAR = 0
+    EXPONENTIAL = 1
+    LOGARITHMIC = 2
+
+
+# 制御曲線名 -> ID と、IDで引く曲線関数
+_CURVE_IDS: Dict[str, ControlCurve] = {
+    "linear": ControlCurve.LINEAR,
+    "exponential": ControlCurve.EXPONENTIAL,
+    "logarithmic": ControlCurve.LOGARITHMIC,
+}
+_CURVE_FNS: Tuple[Callable, ...] = (_linear_curve, _exponential_curve, _logarithmic_curve)
+
+
+def _vca_gain_core(
+    base_gain: float,
+    cv: float,
+    am: float,
+    offset: float,
+    velocity: float,
+    gate: float,
+    max_gain: float,
+    curve_id: int,
+) -> float:
+    """
+    すべての入力が数値の場合のゲイン計算（オフセット加算・ベロシティ/ゲート・制御曲線・範囲制限）。
+    曲線関数の呼び出しを避けるため、線形・指数カーブはインラインで計算します。
+    """
+    gain = (base_gain + cv + offset + am) * velocity * gate
+    if gain <= 0.0:
+        return 0.0
+    # 整数比較のみで分岐（1: ControlCurve.EXPONENTIAL, 2: ControlCurve.LOGARITHMIC）
+    if curve_id == 1:
+        gain = gain * gain
+    elif curve_id == 2:
+        gain = _logarithmic_curve_lut(gain)
+    return max_gain if gain > max_gain else gain
+
 
 class VCA(BaseModule):
     """
@@ -21,6 +154,7 @@ class VCA(BaseModule):
         "exponential": "exp",
         "logarithmic": "log",
     }
+    CURVE_NAMES: Tuple[str, ...] = tuple(CONTROL_CURVES)
 
     # パラメータのデフォルト範囲
     GAIN_RANGE: Tuple[float, float] = (0.0, 2.0)
@@ -29,6 +163,32 @@ class VCA(BaseModule):
     MAX_GAIN_RANGE: Tuple[float, float] = (0.1, 5.0)
     SMOOTHING_TIME_RANGE: Tuple[float, float] = (0.001, 1.0)
 
+    # 毎フレーム参照するパラメータ -> 直接参照用の属性名（parametersは参照用として維持）
+    PARAM_ATTRS: Dict[str, str] = {
+        "gain": "_gain",
+        "cv_amount": "_cv_amount",
+        "offset": "_offset",
+        "max_gain": "_max_gain",
+    }
+
+    __slots__ = (
+        "gain_signal",
+        "gain_smoother",
+        "current_audio_input",
+        "current_gain",
+        "_audio_mul",
+        "_audio_out",
+        "_audio_dirty",
+        "is_gated",
+        "_curve_id",
+        "_gain",
+        "_cv_amount",
+        "_offset",
+        "_max_gain",
+        "_gain_cache_key",
+        "_gain_cache_value",
+    )
+
     def __init__(self, name: str = "VCA", initial_gain: float = 1.0, control_curve: str = "exponential"):
         super().__init__(name)
 
@@ -53,10 +213,18 @@ class VCA(BaseModule):
         # --- pyoオブジェクトと内部状態の初期化 ---
         self.gain_signal: Sig | None = None
         self.gain_smoother: Port | None = None
-        self.initial_output: Sig | None = None  # 初期出力用の無音信号
         self.current_audio_input: PyoObject | None = None
+        self.current_gain: float | None = None  # 最後にgain_signalへ設定した数値ゲイン
+        self._audio_mul: PyoObject | None = None  # 固定出力に設定中のゲイン（mul）
+        self._audio_out: Sig | None = None  # audio_outの固定出力（初期化時に束縛）
+        self._audio_dirty: bool = True  # audio_inの接続が変わり、ルーティングの確認が必要か
 
         self.is_gated: bool = False
+        self._curve_id: ControlCurve = _CURVE_IDS.get(control_curve, ControlCurve.EXPONENTIAL)
+
+        # 数値ゲイン計算の1エントリキャッシュ（入力が前回と同じなら計算結果を再利用）
+        self._gain_cache_key: Tuple | None = None
+        self._gain_cache_value: float = 0.0
 
     def _initialize(self):
         """
@@ -68,135 +236,184 @@ class VCA(BaseModule):
             risetime=self.get_parameter("smoothing_time"),
             falltime=self.get_parameter("smoothing_time"),
         )
-        self.initial_output = Sig(0)
 
         # ガベージコレクションを防ぐために参照を保持
-        self.pyo_objects = [self.gain_signal, self.gain_smoother, self.initial_output]
+        self.pyo_objects = [self.gain_signal, self.gain_smoother]
 
-        # 固定出力オブジェクトを作成
-        self.create_fixed_output("audio_out", 0)
+        # 固定出力オブジェクトを作成し、出力ポートの束縛は初期化時の一度だけ行う
+        self._audio_out = self.create_fixed_output("audio_out", 0)
         self.outputs["envelope_out"] = self.gain_smoother
+        self._audio_dirty = True
+
+    def _read_gain_inputs(self) -> Tuple[Any, float, float, float]:
+        """
+        ゲイン計算に使う入力(gain_cv, am, velocity, gate)を取得し、ゲート状態を更新します。
+        gain_cv以外は数値に変換した値を返します。
+        """
+        # 分類は型ごとにキャッシュされた結果を使う
+        inputs = self.inputs
+        gain_cv = inputs.get("gain_cv")
+        am_contribution = _scalar_input(inputs.get("am_input"), 0.0)
+        velocity_multiplier = _scalar_input(inputs.get("velocity_cv"), 1.0)
+
+        gate_input = inputs.get("gate_input")
+        gate_kind = _input_kind(gate_input)
+        if gate_kind == _KIND_PYO or gate_kind == _KIND_NONE:
+            # PyoObjectのゲートは常に開いているものとして扱う（未接続時のデフォルトも開）
+            is_gated = True
+        elif gate_kind == _KIND_SCALAR:
+            is_gated = gate_input > 0.5
+        else:
+            is_gated = _to_float(gate_input, 0.0) > 0.5
+        # 比較結果をそのまま0.0/1.0の乗数にする（条件分岐なし）
+        self.is_gated = is_gated
+        return gain_cv, am_contribution, velocity_multiplier, float(is_gated)
 
     def _calculate_gain(self) -> float:
         """
         各種パラメータと入力値から、最終的なゲイン値を計算します。
         """
         # パラメータを取得
-        base_gain = self.get_parameter("gain")
-        cv_amount = self.get_parameter("cv_amount")
-        offset = self.get_parameter("offset")
-        max_gain = self.get_parameter("max_gain")
-        control_curve = self.get_parameter("control_curve")
-
-        # --- CV入力の処理 ---
-        gain_cv = self.get_input_value("gain_cv", 0)
-        if isinstance(gain_cv, (int, float)):
-            cv_contribution = gain_cv * cv_amount
-        elif isinstance(gain_cv, PyoObject):
-            # PyoObjectの場合は、cv_amountを乗算したオブジェクトを作成
-            cv_contribution = gain_cv * cv_amount
-        else:
-            cv_contribution = 0
-
-        am_input = self.get_input_value("am_input", 0)
-        am_contribution = am_input if isinstance(am_input, (int, float)) else 0
-
-        # --- ゲインの基本計算 ---
-        if isinstance(cv_contribution, PyoObject):
-            # PyoObjectの場合は、base_gainとoffsetを加算したオブジェクトを作成
-            calculated_gain = cv_contribution + (base_gain + offset + am_contribution)
-        else:
-            calculated_gain = base_gain + cv_contribution + offset + am_contribution
-
-        # --- ベロシティとゲートの適用 ---
-        velocity_cv = self.get_input_value("velocity_cv", 1.0)
-        velocity_multiplier = velocity_cv if isinstance(velocity_cv, (int, float)) else 1.0
-
-        gate_input = self.get_input_value("gate_input", 1.0)
-        gate_multiplier = 0.0
-        if isinstance(gate_input, (int, float)):
-            gate_multiplier = 1.0 if gate_input > 0.5 else 0.0
-            self.is_gated = gate_multiplier > 0.5
-        else:  # PyoObjectなど数値以外の入力
-            gate_multiplier = 1.0
-            self.is_gated = True
-
+        base_gain = self._gain
+        cv_amount = self._cv_amount
+        offset = self._offset
+        max_gain = self._max_gain
+
+        # --- 入力の取得 ---
+        gain_cv, am_contribution, velocity_multiplier, gate_multiplier = self._read_gain_inputs()
+
+        # --- 数値のみの場合はスカラー計算にまとめる ---
+        if _input_kind(gain_cv) != _KIND_PYO:
+            key = (
+                base_gain,
+                _scalar_input(gain_cv, 0.0) * cv_amount,
+                am_contribution,
+                offset,
+                velocity_multiplier,
+                gate_multiplier,
+                max_gain,
+                self._curve_id,
+            )
+            if key != self._gain_cache_key:
+                self._gain_cache_key = key
+                self._gain_cache_value = _vca_gain_core(*key)
+            return self._gain_cache_value
+
+        # --- PyoObjectのCV入力：cv_amountを乗算し、base_gainとoffsetを加算したオブジェクトを作成 ---
+        calculated_gain = gain_cv * cv_amount + (base_gain + offset + am_contribution)
         calculated_gain *= velocity_multiplier
         calculated_gain *= gate_multiplier
 
         # --- 制御曲線の適用 ---
-        if control_curve == "exponential" and calculated_gain > 0:
-            calculated_gain = calculated_gain**2
-        elif control_curve == "logarithmic" and calculated_gain > 0:
-            calculated_gain = math.log1p(calculated_gain) / math.log(2)
+        calculated_gain = _CURVE_FNS[self._curve_id](calculated_gain)
 
-        # --- 最終的な範囲制限 ---
-        return self._clip_value(calculated_gain, 0.0, max_gain)
+        # --- 最終的な範囲制限（数値用のclip_valueは比較がPyoObjectになるため使えない） ---
+        return Clip(calculated_gain, min=0.0, max=max_gain)
 
     def _update_audio_processing(self):
         """
         オーディオ信号の流れを更新（固定出力オブジェクト版）
         """
-        logger.info(f"=== {self.name} _update_audio_processing() start ===")
-
         current_gain = self._calculate_gain()
-        audio_input = self.get_input_value("audio_in")
-        is_valid_input = isinstance(audio_input, PyoObject)
 
-        if is_valid_input:
-            # 新しい信号を作成（入力とゲインを組み合わせ）
+        # audio_inの接続変更が通知された場合のみ固定出力の入力を差し替える（毎フレームSigを作らない）
+        if self._audio_dirty:
+            self._audio_dirty = False
+            audio_input = self.inputs.get("audio_in")
+            if not isinstance(audio_input, PyoObject):
+                audio_input = None
+            if audio_input is not self.current_audio_input:
+                self.current_audio_input = audio_input
+                if audio_input is not None:
+                    self._audio_out.setValue(audio_input)
+                    logger.info("%s updated fixed audio output", self.name)
+                else:
+                    # 入力なし：無音に設定
+                    self._audio_out.setValue(0)
+                    logger.info("%s set to silence via fixed output", self.name)
+
+        if self.current_audio_input is not None:
+            # ゲインは固定出力のmulとして適用
             if isinstance(current_gain, PyoObject):
-                new_signal = Sig(audio_input, mul=current_gain)
+                mul = current_gain
             else:
-                if self.gain_signal:
-                    self.gain_signal.setValue(current_gain)
-                new_signal = Sig(audio_input, mul=self.gain_smoother)
-            
-            # 固定出力オブジェクトを更新
-            self.update_fixed_output("audio_out", new_signal)
-            self.current_audio_input = audio_input
-            logger.info(f"{self.name} updated fixed audio output")
-        else:
-            # 入力なし：無音に設定
-            self.update_fixed_output("audio_out", 0)
-            self.current_audio_input = None
-            logger.info(f"{self.name} set to silence via fixed output")
-
-        logger.info(f"=== {self.name} _update_audio_processing() end ===")
-
+                # bfloat16精度に丸め、前回値と同じならpyoへの更新を省略（平滑化はPortが行う）
+                current_gain = _bf16_quant(current_gain)
+                if self.gain_signal and current_gain != self.current_gain:
+                    self.gain_signal.value = current_gain
+                    self.current_gain = current_gain
+                mul = self.gain_smoother
+            if mul is not self._audio_mul:
+                self._audio_out.setMul(mul)
+                self._audio_mul = mul
+
+    @dsp_probe
     def process(self):
         """
         モジュールのメイン処理。毎フレーム呼び出されることを想定しています。
         """
         self._update_audio_processing()
 
+    def on_input_connected(self, input_name: str, value: Any):
+        if input_name == "audio_in":
+            self._audio_dirty = True
+
+    def on_input_disconnected(self, input_name: str):
+        if input_name == "audio_in":
+            self._audio_dirty = True
+
     # --- パラメータ設定用メソッド ---
 
+    def set_parameter(self, param_name: str, value: Any):
+        super().set_parameter(param_name, value)
+        attr = self.PARAM_ATTRS.get(param_name)
+        if attr is not None:
+            setattr(self, attr, value)
+        elif param_name == "control_curve":
+            curve_id = _CURVE_IDS.get(value)
+            if curve_id is None:
+                return
+            self._curve_id = curve_id
+        else:
+            return
+        self._apply_gain_change()
+
+    def _apply_gain_change(self):
+        """
+        ゲインに影響するパラメータの変更を反映します。
+        CV入力がPyoObjectでなければゲインはスカラー計算なので、process()を待たずに即座に反映する
+        （PyoObjectのCVではゲイン用のオブジェクトを作り直すため、従来通りprocess()で反映）
+        """
+        if self.is_active and _input_kind(self.inputs.get("gain_cv")) != _KIND_PYO:
+            self._update_audio_processing()
+
     def set_gain(self, gain: float):
-        gain = self._clip_value(gain, *self.GAIN_RANGE)
+        gain = clip_value(gain, *self.GAIN_RANGE)
         self.set_parameter("gain", gain)
 
     def set_cv_amount(self, amount: float):
-        amount = self._clip_value(amount, *self.CV_AMOUNT_RANGE)
+        amount = clip_value(amount, *self.CV_AMOUNT_RANGE)
         self.set_parameter("cv_amount", amount)
 
     def set_offset(self, offset: float):
-        offset = self._clip_value(offset, *self.OFFSET_RANGE)
+        offset = clip_value(offset, *self.OFFSET_RANGE)
         self.set_parameter("offset", offset)
 
     def set_control_curve(self, curve: str):
         if curve in self.CONTROL_CURVES:
             self.set_parameter("control_curve", curve)
         else:
-            logger.warning(f"Unknown control curve '{curve}', using 'exponential'")
+            logger.warning("Unknown control curve '%s', using 'exponential'", curve)
             self.set_parameter("control_curve", "exponential")
 
     def set_max_gain(self, max_gain: float):
-        max_gain = self._clip_value(max_gain, *self.MAX_GAIN_RANGE)
+        max_gain = clip_value(max_gain, *self.MAX_GAIN_RANGE)
         self.set_parameter("max_gain", max_gain)
 
     def set_smoothing_time(self, time: float):
-        time = self._clip_value(time, *self.SMOOTHING_TIME_RANGE)
+        time = clip_value(time, *self.SMOOTHING_TIME_RANGE)
+        if time == self.get_parameter("smoothing_time"):
+            return  # 変化がなければPortの内部状態に触れない
         self.set_parameter("smoothing_time", time)
         if self.gain_smoother:
             self.gain_smoother.setRiseTime(time)
@@ -204,19 +421,14 @@ class VCA(BaseModule):
 
     # --- ユーティリティメソッド ---
 
-    def _clip_value(self, value: float, min_val: float, max_val: float) -> float:
-        """指定された範囲内に値をクリップします。"""
-        return max(min_val, min(max_val, value))
-
     def out_to_channel(self, channel: int):
         """指定されたチャンネルに音声を出力します。"""
-        logger.info(f"=== {self.name} out_to_channel({channel}) called ===")
         if self.outputs.get("audio_out"):
-            logger.info(f"{self.name} sending audio output to channel {channel}: {self.outputs['audio_out']}")
+            logger.debug("%s sending audio output to channel %d: %s", self.name, channel, self.outputs["audio_out"])
             self.outputs["audio_out"].out(chnl=channel)
-            logger.info(f"{self.name} audio output sent to channel {channel}")
+            logger.info("%s audio output sent to channel %d", self.name, channel)
         else:
-            logger.warning(f"{self.name} has no audio output to play.")
+            logger.warning("%s has no audio output to play.", self.name)
 
     def stop_output(self):
         """音声出力を停止します。"""
@@ -225,18 +437,26 @@ class VCA(BaseModule):
 
     def randomize_parameters(self):
         """モジュールのパラメータをランダムな値に設定します。"""
-        self.set_gain(random.uniform(*self.GAIN_RANGE))
-        self.set_cv_amount(random.uniform(*self.CV_AMOUNT_RANGE))
-        self.set_offset(random.uniform(*self.OFFSET_RANGE))
-        self.set_control_curve(random.choice(list(self.CONTROL_CURVES.keys())))
-        self.set_smoothing_time(random.uniform(0.005, 0.05))
-        logger.info(f"{self.name} parameters randomized.")
-
-    def get_available_curves(self) -> List[str]:
-        """利用可能な制御曲線のリストを返します。"""
-        return list(self.CONTROL_CURVES.keys())
+        # ゲイン・CV量・オフセット・スムージング時間・曲線選択用の値を一度に生成
+        gain, cv_amount, offset, smoothing_time, curve_pos = _RNG.uniform(
+            [self.GAIN_RANGE[0], self.CV_AMOUNT_RANGE[0], self.OFFSET_RANGE[0], 0.005, 0.0],
+            [self.GAIN_RANGE[1], self.CV_AMOUNT_RANGE[1], self.OFFSET_RANGE[1], 0.05, 1.0],
+        ).tolist()
+        self.set_gain(gain)
+        self.set_cv_amount(cv_amount)
+        self.set_offset(offset)
+        self.set_control_curve(self.CURVE_NAMES[int(curve_pos * len(self.CURVE_NAMES))])
+        self.set_smoothing_time(smoothing_time)
+        logger.info("%s parameters randomized.", self.name)
+
+    def get_available_curves(self) -> Tuple[str, ...]:
+        """利用可能な制御曲線の一覧を返します（事前に作成した不変のタプル）。"""
+        return self.CURVE_NAMES
 
     def _cleanup(self):
         """モジュール停止時のクリーンアップ処理。"""
         super()._cleanup()
         self.current_audio_input = None
+        self.current_gain = None
+        self._audio_mul = None
+        self._gain_cache_key = None
@@ -1,11 +1,27 @@
-import random
+import math
 import logging
-from typing import Dict, List, Tuple
+from enum import IntEnum
+from typing import Any, Callable, Dict, Tuple
+import numpy as np
 from pyo import Biquad, Sig, PyoObject
-from .base_module import BaseModule
+from .base_module import BaseModule, clip_value, get_silence
+from ._probe import dsp_probe
 
 logger = logging.getLogger(__name__)
 
+# randomize_parameters用の乱数生成器（全パラメータを1回の呼び出しでまとめて生成）
+_RNG = np.random.default_rng()
+
+
+class FilterType(IntEnum):
+    """フィルタータイプのID（pyoのBiquadのtype番号）"""
+
+    LOWPASS = 0
+    HIGHPASS = 1
+    BANDPASS = 2
+    BANDREJECT = 3
+    ALLPASS = 4
+
 
 class VCF(BaseModule):
     """
@@ -16,12 +32,15 @@ class VCF(BaseModule):
 
     # --- 定数の定義 ---
     FILTER_TYPES: Dict[int, str] = {
-        0: "lowpass",
-        1: "highpass",
-        2: "bandpass",
-        3: "bandreject",
-        4: "allpass",
+        FilterType.LOWPASS: "lowpass",
+        FilterType.HIGHPASS: "highpass",
+        FilterType.BANDPASS: "bandpass",
+        FilterType.BANDREJECT: "bandreject",
+        FilterType.ALLPASS: "allpass",
     }
+    FILTER_TYPE_NAMES: Tuple[str, ...] = tuple(FILTER_TYPES.values())
+    # フィルタータイプ名 -> ID（set_filter_typeでの逆引き用）
+    FILTER_TYPE_IDS: Dict[str, int] = {name: type_id for type_id, name in FILTER_TYPES.items()}
 
     # パラメータのデフォルト範囲
     FREQ_RANGE: Tuple[float, float] = (20.0, 20000.0)
@@ -29,14 +48,28 @@ class VCF(BaseModule):
     GAIN_RANGE: Tuple[float, float] = (0.0, 2.0)
     CV_DEPTH_RANGE: Tuple[float, float] = (0.0, 10000.0)
 
+    # インスタンス属性はスロットに格納（__dict__を持たない）
+    __slots__ = (
+        "filter",
+        "initial_output",
+        "current_audio_input",
+        "_last_applied",
+        "_params_dirty",
+        "_set_freq",
+        "_audio_dirty",
+    )
+
     def __init__(self, name: str = "VCF", initial_freq: float = 1000.0, initial_q: float = 1.0):
+        # Q・ゲイン・タイプが変更されたかどうか（set_parameterより先に用意する）
+        self._params_dirty = True
+
         super().__init__(name)
 
         # --- パラメータの初期化 ---
         self.set_parameter("freq", initial_freq)
         self.set_parameter("q", initial_q)
         self.set_parameter("gain", 1.0)
-        self.set_parameter("filter_type", 0)  # 0: lowpass
+        self.set_parameter("filter_type", FilterType.LOWPASS)
         self.set_parameter("freq_cv_depth", 2000.0)
 
         # --- 入出力ポートの定義 ---
@@ -49,12 +82,17 @@ class VCF(BaseModule):
         self.filter: Biquad | None = None
         self.initial_output: Sig | None = None
         self.current_audio_input: PyoObject | None = None
+        self._set_freq: Callable | None = None  # filter.setFreqを束縛したもの（毎フレームの属性解決を避ける）
+        self._audio_dirty: bool = True  # audio_inの接続が変わり、ルーティングの確認が必要か
+
+        # 最後にpyoオブジェクトへ適用した値（変化がなければsetterを呼ばない）
+        self._last_applied: Dict[str, Any] = {"freq": None, "q": None, "mul": None, "type": None}
 
     def _initialize(self):
         """
         初期化処理 - pyoオブジェクトを作成し、参照を保持します。
         """
-        self.initial_output = Sig(0)
+        self.initial_output = get_silence()
         self.filter = Biquad(
             input=self.initial_output,
             freq=self.get_parameter("freq"),
@@ -62,110 +100,122 @@ class VCF(BaseModule):
             type=self.get_parameter("filter_type"),
         )
 
-        # ガベージコレクションを防ぐために参照を保持
-        self.pyo_objects = [self.filter, self.initial_output]
+        # ガベージコレクションを防ぐために参照を保持（共有の無音信号は停止しないため含めない）
+        self.pyo_objects = [self.filter]
 
         # 初期出力を設定
         self.outputs["audio_out"] = self.filter
+        self._set_freq = self.filter.setFreq
 
-    def _update_filter_params(self):
+        # 新しいフィルターには次回の更新ですべてのパラメータを適用する
+        self._last_applied = {"freq": None, "q": None, "mul": None, "type": None}
+        self._params_dirty = True
+        self._audio_dirty = True
+
+    @dsp_probe
+    def process(self):
         """
-        各種パラメータと入力値から、最終的なフィルター設定を計算し、適用します。
+        モジュールのメイン処理。毎フレーム呼び出されることを想定しています。
+        入力とパラメータを一度だけ読み込み、オーディオルーティングとフィルター設定の変更をまとめて適用します。
         """
-        if not self.filter:
+        filt = self.filter
+        if not filt:
             return
 
-        # --- 周波数の計算 ---
-        base_freq = self.get_parameter("freq")
-        cv_depth = self.get_parameter("freq_cv_depth")
-        freq_cv = self.get_input_value("freq_cv", 0)
+        inputs = self.inputs
+        parameters = self.parameters
+        last_applied = self._last_applied
+
+        # --- オーディオルーティング（audio_inの接続変更が通知された場合のみ確認） ---
+        if self._audio_dirty:
+            self._audio_dirty = False
+            audio_input = inputs.get("audio_in")
+            if not isinstance(audio_input, PyoObject):
+                audio_input = None
+            # pyoオブジェクトの==は比較オブジェクトを返すため同一性で判定
+            if audio_input is not self.current_audio_input:
+                self.current_audio_input = audio_input
+                # 入力が切断された場合は無音信号に接続
+                filt.setInput(audio_input if audio_input is not None else self.initial_output)
 
-        cv_offset = 0
+        # --- 周波数の計算 ---
+        final_freq = parameters["freq"]
+        freq_cv = inputs.get("freq_cv")
         if isinstance(freq_cv, (int, float)):
-            cv_offset = freq_cv * cv_depth
-
-        final_freq = base_freq + cv_offset
-        final_freq = self._clip_value(final_freq, *self.FREQ_RANGE)
+            final_freq += freq_cv * parameters["freq_cv_depth"]
+        final_freq = clip_value(final_freq, *self.FREQ_RANGE)
 
-        # --- パラメータをpyoオブジェクトに適用 ---
-        self.filter.setFreq(final_freq)
-        self.filter.setQ(self.get_parameter("q"))
-        self.filter.setMul(self.get_parameter("gain"))
-        self.filter.setType(self.get_parameter("filter_type"))
+        # --- 変化したパラメータのみpyoオブジェクトに適用 ---
+        last_freq = last_applied["freq"]
+        if last_freq is None or not math.isclose(final_freq, last_freq, rel_tol=1e-4):
+            self._set_freq(final_freq)
+            last_applied["freq"] = final_freq
 
-    def _update_audio_routing(self):
-        """
-        オーディオ信号のルーティングを更新します。
-        入力の接続状態を監視し、pyoオブジェクトの接続を管理します。
-        """
-        if not self.filter:
+        # Q・ゲイン・タイプはパラメータが変更された場合のみ確認
+        if not self._params_dirty:
             return
-
-        audio_input = self.get_input_value("audio_in")
-        is_valid_input = isinstance(audio_input, PyoObject)
-
-        if is_valid_input:
-            # 新しい入力が接続された場合、または切断された後に再接続された場合
-            if self.current_audio_input != audio_input:
-                self.current_audio_input = audio_input
-                self.filter.setInput(self.current_audio_input)
-        else:
-            # 入力が切断された場合、無音信号に接続
-            if self.current_audio_input is not None:
-                self.current_audio_input = None
-                if self.initial_output:
-                    self.filter.setInput(self.initial_output)
-
-    def process(self):
-        """
-        モジュールのメイン処理。毎フレーム呼び出されることを想定しています。
-        """
-        self._update_audio_routing()
-        self._update_filter_params()
+        q = parameters["q"]
+        if q != last_applied["q"]:
+            filt.setQ(q)
+            last_applied["q"] = q
+        gain = parameters["gain"]
+        if gain != last_applied["mul"]:
+            filt.setMul(gain)
+            last_applied["mul"] = gain
+        filter_type = parameters["filter_type"]
+        if filter_type != last_applied["type"]:
+            filt.setType(filter_type)
+            last_applied["type"] = filter_type
+        self._params_dirty = False
+
+    def on_input_connected(self, input_name: str, value: Any):
+        if input_name == "audio_in":
+            self._audio_dirty = True
+
+    def on_input_disconnected(self, input_name: str):
+        if input_name == "audio_in":
+            self._audio_dirty = True
 
     # --- パラメータ設定用メソッド ---
 
+    def set_parameter(self, param_name: str, value: Any):
+        super().set_parameter(param_name, value)
+        self._params_dirty = True
+
     def set_frequency(self, freq: float):
-        freq = self._clip_value(freq, *self.FREQ_RANGE)
+        freq = clip_value(freq, *self.FREQ_RANGE)
         self.set_parameter("freq", freq)
 
     def set_q(self, q: float):
-        q = self._clip_value(q, *self.Q_RANGE)
+        q = clip_value(q, *self.Q_RANGE)
         self.set_parameter("q", q)
 
     def set_gain(self, gain: float):
-        gain = self._clip_value(gain, *self.GAIN_RANGE)
+        gain = clip_value(gain, *self.GAIN_RANGE)
         self.set_parameter("gain", gain)
 
     def set_filter_type(self, type_name: str):
-        type_id = -1
-        for i, name in self.FILTER_TYPES.items():
-            if name == type_name:
-                type_id = i
-                break
-
-        if type_id != -1:
+        type_id = self.FILTER_TYPE_IDS.get(type_name)
+        if type_id is not None:
             self.set_parameter("filter_type", type_id)
         else:
-            logger.warning(f"Unknown filter type '{type_name}', using 'lowpass'")
-            self.set_parameter("filter_type", 0)
+            logger.warning("Unknown filter type '%s', using 'lowpass'", type_name)
+            self.set_parameter("filter_type", FilterType.LOWPASS)
 
     # --- ユーティリティメソッド ---
 
-    def _clip_value(self, value: float, min_val: float, max_val: float) -> float:
-        """指定された範囲内に値をクリップします。"""
-        return max(min_val, min(max_val, value))
-
     def randomize_parameters(self):
         """モジュールのパラメータをランダムな値に設定します。"""
-        self.set_frequency(random.uniform(100, 5000))
-        self.set_q(random.uniform(0.5, 10))
-        self.set_gain(random.uniform(0.8, 1.2))
-        logger.info(f"{self.name} parameters randomized.")
-
-    def get_available_filter_types(self) -> List[str]:
-        """利用可能なフィルタータイプのリストを返します。"""
-        return list(self.FILTER_TYPES.values())
+        # 周波数・Q・ゲインを一度に生成
+        freq, q, gain = _RNG.uniform([100.0, 0.5, 0.8], [5000.0, 10.0, 1.2]).tolist()
+        self.set_frequency(freq)
+        self.set_q(q)
+        self.set_gain(gain)
+        logger.info("%s parameters randomized.", self.name)
+
+    def get_available_filter_types(self) -> Tuple[str, ...]:
+        """利用可能なフィルタータイプの一覧を返します（事前に作成した不変のタプル）。"""
+        return self.FILTER_TYPE_NAMES
 
     def _cleanup(self):
         """モジュール停止時のクリーンアップ処理。"""
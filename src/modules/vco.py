@@ -1,11 +1,96 @@
-import random
+import math
 import logging
-from typing import Dict, List, Tuple
-from pyo import Sine, LFO, Noise, Sig, PyoObject
-from .base_module import BaseModule
+from typing import Any, Callable, Dict, FrozenSet, List, Tuple
+import numpy as np
+from pyo import HarmTable, Osc, Noise, Sig, SigTo, PyoObject
+from .base_module import BaseModule, clip_value, get_shared
+from ._probe import dsp_probe
 
 logger = logging.getLogger(__name__)
 
+# randomize_parameters用の乱数生成器（全パラメータを1回の呼び出しでまとめて生成）
+_RNG = np.random.default_rng()
+
+# サイン波用の波形テーブルサイズ（線形補間で十分な精度が得られる大きさ）
+SINE_TABLE_SIZE: int = 8192
+
+# 周波数変更時のポルタメント時間（秒）。pyo側で補間し、process()の呼び出し間隔による段差を抑える
+FREQ_GLIDE_TIME: float = 0.005
+
+# 帯域制限波形テーブル（ミップマップ）の設定
+# レベルkは基本周波数 MIPMAP_BASE_FREQ * 2**k 〜 MIPMAP_BASE_FREQ * 2**(k+1) を担当し、
+# その上限周波数でナイキスト周波数（起動中のサーバーのサンプリングレートから算出）を超えない倍音のみを含む
+MIPMAP_BASE_FREQ: float = 20.0
+MIPMAP_LEVELS: int = 10  # 20Hz〜20480Hz
+MIPMAP_WAVEFORMS: Tuple[str, ...] = ("saw", "square", "triangle")
+
+
+def _band_limited_partials(waveform: str, max_harmonic: int) -> List[float]:
+    """HarmTable用の倍音振幅リスト（第1倍音〜第max_harmonic倍音）を返します。"""
+    partials = []
+    for n in range(1, max_harmonic + 1):
+        if waveform == "saw":
+            partials.append(-1.0 / n)  # 上昇ノコギリ波
+        elif n % 2 == 0:
+            partials.append(0.0)  # 矩形波・三角波は奇数倍音のみ
+        elif waveform == "square":
+            partials.append(1.0 / n)
+        else:
+            partials.append((1.0 if n % 4 == 1 else -1.0) / (n * n))  # 三角波
+    return partials
+
+
+def _build_mipmap(waveform: str, sample_rate: float) -> Tuple[HarmTable, ...]:
+    """サンプリングレートsample_rateで使う波形のミップマップ（各レベルの帯域制限テーブル）を作成します。"""
+    nyquist = sample_rate / 2
+    tables = []
+    for level in range(MIPMAP_LEVELS):
+        top_freq = MIPMAP_BASE_FREQ * 2 ** (level + 1)
+        max_harmonic = max(1, int(nyquist / top_freq))
+        table = HarmTable(_band_limited_partials(waveform, max_harmonic), size=SINE_TABLE_SIZE)
+        table.normalize()
+        tables.append(table)
+    return tuple(tables)
+
+
+def _mipmap_level(freq: float) -> int:
+    """周波数に対応するミップマップのレベルを返します。"""
+    if freq < MIPMAP_BASE_FREQ * 2:
+        return 0
+    return min(MIPMAP_LEVELS - 1, int(math.log2(freq / MIPMAP_BASE_FREQ)))
+
+
+# 周波数計算カーネル（CV/FM入力が数値かどうかの組み合わせごとに特殊化）
+# 引数: (オクターブ・ファインチューン適用後の周波数, freq_cv, fm_input, fm_depth)
+def _freq_cv_fm(tuned_freq: float, freq_cv: float, fm_input: float, fm_depth: float) -> float:
+    return tuned_freq * math.exp2(freq_cv) + fm_input * fm_depth
+
+
+def _freq_cv(tuned_freq: float, freq_cv: float, fm_input: float, fm_depth: float) -> float:
+    return tuned_freq * math.exp2(freq_cv)
+
+
+def _freq_fm(tuned_freq: float, freq_cv: float, fm_input: float, fm_depth: float) -> float:
+    return tuned_freq + fm_input * fm_depth
+
+
+def _freq_const(tuned_freq: float, freq_cv: float, fm_input: float, fm_depth: float) -> float:
+    return tuned_freq
+
+
+# (freq_cvが数値, fm_inputが数値) -> カーネル
+_FREQ_KERNELS: Dict[Tuple[bool, bool], Callable[[float, float, float, float], float]] = {
+    (True, True): _freq_cv_fm,
+    (True, False): _freq_cv,
+    (False, True): _freq_fm,
+    (False, False): _freq_const,
+}
+
+
+def _is_numeric_input(value: Any) -> bool:
+    """入力値が周波数計算に使える数値（未接続を含む）かどうかを返します。"""
+    return value is None or type(value) in (int, float)
+
 
 class VCO(BaseModule):
     """
@@ -15,7 +100,9 @@ class VCO(BaseModule):
     """
 
     # --- 定数の定義 ---
-    WAVEFORMS: List[str] = ["sine", "saw", "square", "triangle", "noise"]
+    WAVEFORMS: Tuple[str, ...] = ("sine", "saw", "square", "triangle", "noise")
+    # 波形名の存在チェック用
+    WAVEFORM_SET: FrozenSet[str] = frozenset(WAVEFORMS)
 
     # パラメータのデフォルト範囲
     OCTAVE_RANGE: Tuple[int, int] = (-2, 2)
@@ -23,12 +110,55 @@ class VCO(BaseModule):
     AMPLITUDE_RANGE: Tuple[float, float] = (0.0, 1.0)
     FREQ_RANGE: Tuple[float, float] = (20.0, 20000.0)
 
+    # オクターブ・ファインチューンの周波数倍率テーブル（毎フレームのpow計算を避ける）
+    OCTAVE_MUL: Dict[int, float] = {o: 2.0**o for o in range(OCTAVE_RANGE[0], OCTAVE_RANGE[1] + 1)}
+    FINE_MUL: Dict[int, float] = {
+        c: 2.0 ** (c / 1200.0) for c in range(int(FINE_TUNE_RANGE[0]), int(FINE_TUNE_RANGE[1]) + 1)
+    }  # 1セント刻み（整数セント以外はpowで計算）
+
+    # 毎フレーム参照するパラメータ -> 直接参照用の属性名（parametersは参照用として維持）
+    PARAM_ATTRS: Dict[str, str] = {
+        "base_freq": "_base_freq",
+        "octave": "_octave",
+        "fine_tune": "_fine_tune",
+        "fm_depth": "_fm_depth",
+        "amplitude": "_amp",
+    }
+
+    __slots__ = (
+        "current_freq",
+        "last_waveform",
+        "amp_signal",
+        "freq_signal",
+        "oscillator",
+        "oscillators",
+        "_base_freq",
+        "_octave",
+        "_fine_tune",
+        "_fm_depth",
+        "_amp",
+        "_last_amp",
+        "_waveform_dirty",
+        "_freq_cache_key",
+        "_freq_dirty",
+        "_mip_tables",
+        "_active_tables",
+        "_active_level",
+        "_reset_fn",
+        "_set_freq",
+        "_last_sync",
+        "_last_reset",
+        "_cv_numeric",
+        "_fm_numeric",
+        "_freq_kernel",
+    )
+
     def __init__(self, name: str = "VCO", base_freq: float = 440.0, waveform: str = "sine"):
         super().__init__(name)
 
         # --- パラメータの初期化 ---
         self.set_parameter("base_freq", base_freq)
-        self.set_parameter("waveform", waveform if waveform in self.WAVEFORMS else "sine")
+        self.set_parameter("waveform", waveform if waveform in self.WAVEFORM_SET else "sine")
         self.set_parameter("amplitude", 0.5)
         self.set_parameter("octave", 0)
         self.set_parameter("fine_tune", 0.0)
@@ -47,148 +177,260 @@ class VCO(BaseModule):
         # --- pyoオブジェクトと内部状態の初期化 ---
         self.current_freq: float = base_freq
         self.last_waveform: str = self.get_parameter("waveform")
+        # 波形パラメータが変更され、まだ反映していないか
+        self._waveform_dirty: bool = False
 
         self.amp_signal: Sig | None = None
+        self.freq_signal: SigTo | None = None
+        # 最後にamp_signalへ設定した振幅
+        self._last_amp: float | None = None
         self.oscillator: PyoObject | None = None
         self.oscillators: Dict[str, PyoObject] = {}
 
+        # 前回周波数計算に使った値（変化がなければ再計算・setFreqを行わない）
+        self._freq_cache_key: Tuple[float, ...] | None = None
+        # アクティブなオシレーターが切り替わった場合は周波数を再適用する
+        self._freq_dirty: bool = True
+
+        # 波形名 -> 帯域制限テーブルのミップマップ（サイン波・ノイズは対象外）
+        self._mip_tables: Dict[str, Tuple[PyoObject, ...]] = {}
+        # アクティブなオシレーターのミップマップと、現在読み出しているレベル
+        self._active_tables: Tuple[PyoObject, ...] | None = None
+        self._active_level: int = -1
+
+        # アクティブなオシレーターのreset（波形切り替え時に解決）と、前回の同期/リセット入力
+        self._reset_fn: Callable[[], Any] | None = None
+        # freq_signal.setValue（開始時に解決）
+        self._set_freq: Callable[[float], Any] | None = None
+        self._last_sync: bool = False
+        self._last_reset: bool = False
+
+        # CV/FM入力が数値かどうかと、それに応じた周波数計算カーネル（入力の接続・切断時に選び直す）
+        self._cv_numeric: bool = True
+        self._fm_numeric: bool = True
+        self._freq_kernel: Callable[[float, float, float, float], float] = _freq_cv_fm
+
     def _initialize(self):
         """
         初期化処理 - pyoオブジェクトを作成し、参照を保持します。
+        オシレーターは選択中の波形のものだけを作成し、他の波形は切り替え時に作成します。
         """
-        self.amp_signal = Sig(self.get_parameter("amplitude"))
-        self._create_oscillators()
+        self.amp_signal = Sig(self._amp)
+        self._last_amp = self._amp
+        # 全オシレーターが参照する周波数信号（周波数の変更はこの信号への1回のsetValueで済む）
+        self.freq_signal = SigTo(self.current_freq, time=FREQ_GLIDE_TIME, init=self.current_freq)
+        self._set_freq = self.freq_signal.setValue
+
+        # ガベージコレクションを防ぐために参照を保持（オシレーターは作成時に追加）
+        self.pyo_objects = [self.amp_signal, self.freq_signal]
         self._set_waveform(self.get_parameter("waveform"))
 
-        # ガベージコレクションを防ぐために参照を保持
-        self.pyo_objects = [self.amp_signal] + list(self.oscillators.values())
-
-    def _create_oscillators(self):
+    def _create_oscillator(self, waveform: str) -> PyoObject:
         """
-        利用可能なすべての波形のpyoオブジェクトを生成し、辞書に格納します。
+        指定された波形のpyoオブジェクトを生成します。
         """
-        freq = self.get_parameter("base_freq")
         amp = self.amp_signal
 
-        self.oscillators = {
-            "sine": Sine(freq=freq, mul=amp),
-            "saw": LFO(freq=freq, sharp=1.0, type=0, mul=amp),
-            "square": LFO(freq=freq, sharp=0.5, type=2, mul=amp),
-            "triangle": LFO(freq=freq, sharp=0.5, type=3, mul=amp),
-            "noise": Noise(mul=amp * 0.1),  # ノイズは他より音量が大きいため調整
-        }
+        if waveform == "noise":
+            # ノイズ源は全VCOで1つを共有し、VCOごとの音量はSigのmulで調整する
+            noise = get_shared("vco_noise", Noise)
+            return Sig(noise, mul=amp * 0.1)  # ノイズは他より音量が大きいため調整
+
+        if waveform in MIPMAP_WAVEFORMS:
+            # ノコギリ波・矩形波・三角波は全VCOで共有する帯域制限テーブルを周波数に応じて切り替える（エイリアシング対策）
+            # 帯域制限はサーバーのサンプリングレートに依存するため、レートごとに共有する
+            sample_rate = amp.getSamplingRate()
+            tables = get_shared(f"vco_{waveform}_mipmap_{sample_rate:g}", lambda: _build_mipmap(waveform, sample_rate))
+            self._mip_tables[waveform] = tables
+            table = tables[_mipmap_level(self.current_freq)]
+        else:
+            # サイン波は全VCOで共有する波形テーブルを読み出す（サンプルごとのsin計算を避ける）
+            table = get_shared("vco_sine_table", lambda: HarmTable([1], size=SINE_TABLE_SIZE))
+        return Osc(table=table, freq=self.freq_signal, interp=2, mul=amp)
 
     def _set_waveform(self, waveform: str):
         """
-        出力する波形を、生成済みのオシレーターから選択します。
+        出力する波形のオシレーターを選択します。
+        未作成の波形はここで作成し、それまで出力していたオシレーターは停止します。
         """
-        self.oscillator = self.oscillators.get(waveform, self.oscillators["sine"])
+        key = waveform if waveform in self.WAVEFORM_SET else "sine"
+        oscillator = self.oscillators.get(key)
+        if oscillator is None:
+            oscillator = self.oscillators[key] = self._create_oscillator(key)
+            self.pyo_objects.append(oscillator)
+        elif oscillator is not self.oscillator:
+            oscillator.play()
+
+        # 出力しなくなったオシレーターはpyoの処理対象から外す
+        if self.oscillator is not None and self.oscillator is not oscillator:
+            self.oscillator.stop()
+
+        self.oscillator = oscillator
         self.outputs["audio_out"] = self.oscillator
         self.outputs["sync_out"] = self.oscillator  # 同期出力も同じ信号
         self.last_waveform = waveform
+        self._freq_dirty = True
+        self._active_tables = self._mip_tables.get(key)
+        self._reset_fn = getattr(self.oscillator, "reset", None)
+        self._active_level = -1
+
+    def _tuned_freq(self, base_freq: float, octave: int, fine_tune: float) -> float:
+        """
+        基本周波数にオクターブとファインチューンを適用した周波数を返します。
+        整数セントのファインチューンはテーブルを参照し、それ以外はそのまま計算します。
+        """
+        octave_mul = self.OCTAVE_MUL.get(octave)
+        if octave_mul is None:
+            octave_mul = 2.0**octave
+        # 5.0 と 5 は同じキーとして引ける
+        fine_mul = self.FINE_MUL.get(fine_tune)
+        if fine_mul is None:
+            fine_mul = 2.0 ** (fine_tune / 1200.0)
+        return base_freq * octave_mul * fine_mul
 
     def _update_frequency(self):
         """
-        各種パラメータと入力値から、最終的な周波数を計算し、全オシレーターに適用します。
+        各種パラメータと入力値から、最終的な周波数を計算し、アクティブなオシレーターに適用します。
         """
         # パラメータを取得
-        base_freq = self.get_parameter("base_freq")
-        octave = self.get_parameter("octave")
-        fine_tune = self.get_parameter("fine_tune")
-        fm_depth = self.get_parameter("fm_depth")
-
-        # オクターブとファインチューンを適用
-        freq = base_freq * (2**octave) * (2 ** (fine_tune / 1200.0))
-
-        # CV入力 (1V/Oct) を適用
-        freq_cv = self.get_input_value("freq_cv", 0)
-        if isinstance(freq_cv, (int, float)):
-            freq *= 2**freq_cv
-
-        # FM入力を適用
-        fm_input = self.get_input_value("fm_input", 0)
-        if isinstance(fm_input, (int, float)):
-            freq += fm_input * fm_depth
-
-        # 周波数をクリッピングして適用
-        self.current_freq = self._clip_value(freq, *self.FREQ_RANGE)
-        for osc in self.oscillators.values():
-            if hasattr(osc, "setFreq"):
-                osc.setFreq(self.current_freq)
+        base_freq = self._base_freq
+        octave = self._octave
+        fine_tune = self._fine_tune
+        fm_depth = self._fm_depth
+
+        # 数値のCV/FM入力のみ周波数計算に使用する
+        # （PyoObjectの==は比較オブジェクトを返すため、キャッシュキーには含めない）
+        freq_cv = self.get_input_value("freq_cv", 0) if self._cv_numeric else 0
+        fm_input = self.get_input_value("fm_input", 0) if self._fm_numeric else 0
+
+        # 前回と同じ値なら再計算しない
+        key = (base_freq, octave, fine_tune, fm_depth, freq_cv, fm_input)
+        if key == self._freq_cache_key and not self._freq_dirty:
+            return
+
+        # オクターブ・ファインチューン・CV入力 (1V/Oct)・FM入力を適用し、範囲内にクリップ
+        freq = self._freq_kernel(self._tuned_freq(base_freq, octave, fine_tune), freq_cv, fm_input, fm_depth)
+        min_freq, max_freq = self.FREQ_RANGE
+        freq = min_freq if freq < min_freq else (max_freq if freq > max_freq else freq)
+
+        # 全オシレーター共通の周波数信号に適用
+        self.current_freq = freq
+        self._freq_cache_key = key
+        if self.oscillator is None:
+            return
+        self._set_freq(self.current_freq)
+        self._freq_dirty = False
+
+        # オクターブ境界をまたいだ場合は帯域制限テーブルを切り替える
+        if self._active_tables is not None:
+            level = _mipmap_level(self.current_freq)
+            if level != self._active_level:
+                self.oscillator.setTable(self._active_tables[level])
+                self._active_level = level
 
     def _update_amplitude(self):
         """
-        振幅パラメータの変更をamp_signalに反映します。
+        振幅パラメータの変更をamp_signalに反映します（前回から変化した場合のみ）。
         """
-        if self.amp_signal:
-            self.amp_signal.setValue(self.get_parameter("amplitude"))
+        amp = self._amp
+        if self.amp_signal is not None and amp != self._last_amp:
+            self.amp_signal.setValue(amp)
+            self._last_amp = amp
 
+    @dsp_probe
     def process(self):
         """
         モジュールのメイン処理。毎フレーム呼び出されることを想定しています。
         """
+        # 波形の変更をチェック（切り替え後のオシレーターに同じフレームで周波数を適用するため先に行う）
+        if self._waveform_dirty:
+            self._waveform_dirty = False
+            current_waveform = self.parameters["waveform"]
+            if current_waveform != self.last_waveform:
+                self._set_waveform(current_waveform)
+
         self._update_frequency()
         self._update_amplitude()
 
-        # 波形の変更をチェック
-        current_waveform = self.get_parameter("waveform")
-        if current_waveform != self.last_waveform:
-            self._set_waveform(current_waveform)
-
-        # 同期/リセット入力の処理
-        sync_input = self.get_input_value("sync_input", 0)
-        if sync_input and hasattr(self.oscillator, "reset"):
-            self.oscillator.reset()
-
-        reset_input = self.get_input_value("reset_input", 0)
-        if reset_input and hasattr(self.oscillator, "reset"):
-            self.oscillator.reset()
+        # 同期/リセット入力の処理（立ち上がりでのみリセットする）
+        sync_input = bool(self.get_input_value("sync_input", 0))
+        reset_input = bool(self.get_input_value("reset_input", 0))
+        if self._reset_fn is not None and (
+            (sync_input and not self._last_sync) or (reset_input and not self._last_reset)
+        ):
+            self._reset_fn()
+        self._last_sync = sync_input
+        self._last_reset = reset_input
+
+    def _select_freq_kernel(self):
+        """現在のCV/FM入力の種類に合わせて周波数計算カーネルを選び直します。"""
+        self._cv_numeric = _is_numeric_input(self.inputs.get("freq_cv"))
+        self._fm_numeric = _is_numeric_input(self.inputs.get("fm_input"))
+        self._freq_kernel = _FREQ_KERNELS[self._cv_numeric, self._fm_numeric]
+        self._freq_dirty = True
+
+    def on_input_connected(self, input_name: str, value: Any):
+        if input_name in ("freq_cv", "fm_input"):
+            self._select_freq_kernel()
+
+    def on_input_disconnected(self, input_name: str):
+        if input_name in ("freq_cv", "fm_input"):
+            self._select_freq_kernel()
 
     # --- パラメータ設定用メソッド ---
 
+    def set_parameter(self, param_name: str, value: Any):
+        super().set_parameter(param_name, value)
+        attr = self.PARAM_ATTRS.get(param_name)
+        if attr is not None:
+            setattr(self, attr, value)
+        elif param_name == "waveform":
+            # 波形はprocess()で毎フレーム比較せず、変更があった場合のみ切り替える
+            self._waveform_dirty = True
+
     def set_frequency(self, freq: float):
         self.set_parameter("base_freq", freq)
         self._update_frequency()
 
     def set_waveform(self, waveform: str):
-        if waveform in self.WAVEFORMS:
+        if waveform in self.WAVEFORM_SET:
             self.set_parameter("waveform", waveform)
         else:
-            logger.warning(f"Unknown waveform '{waveform}', using 'sine'")
+            logger.warning("Unknown waveform '%s', using 'sine'", waveform)
             self.set_parameter("waveform", "sine")
 
     def set_octave(self, octave: int):
-        octave = int(self._clip_value(octave, *self.OCTAVE_RANGE))
+        octave = int(clip_value(octave, *self.OCTAVE_RANGE))
         self.set_parameter("octave", octave)
         self._update_frequency()
 
     def set_fine_tune(self, cents: float):
-        cents = self._clip_value(cents, *self.FINE_TUNE_RANGE)
+        cents = clip_value(cents, *self.FINE_TUNE_RANGE)
         self.set_parameter("fine_tune", cents)
         self._update_frequency()
 
     def set_amplitude(self, amp: float):
-        amp = self._clip_value(amp, *self.AMPLITUDE_RANGE)
+        amp = clip_value(amp, *self.AMPLITUDE_RANGE)
         self.set_parameter("amplitude", amp)
         self._update_amplitude()
 
     # --- ユーティリティメソッド ---
 
-    def _clip_value(self, value: float, min_val: float, max_val: float) -> float:
-        """指定された範囲内に値をクリップします。"""
-        return max(min_val, min(max_val, value))
-
     def randomize_parameters(self):
         """モジュールのパラメータをランダムな値に設定します。"""
-        self.set_frequency(55 * (2 ** random.randint(0, 5)))  # A1-A6
-        self.set_waveform(random.choice(self.WAVEFORMS))
-        self.set_octave(random.randint(-1, 1))
-        self.set_fine_tune(random.uniform(-50, 50))
-        self.set_amplitude(random.uniform(0.3, 0.8))
-        logger.info(f"{self.name} parameters randomized.")
-
-    def get_available_waveforms(self) -> List[str]:
-        """利用可能な波形のリストを返します。"""
+        # 周波数・波形・オクターブ選択用の値とファインチューン・振幅を一度に生成
+        freq_pos, waveform_pos, octave_pos, cents, amp = _RNG.uniform(
+            [0.0, 0.0, 0.0, -50.0, 0.3], [1.0, 1.0, 1.0, 50.0, 0.8]
+        ).tolist()
+        self.set_frequency(55 << int(freq_pos * 6))  # A1-A6
+        self.set_waveform(self.WAVEFORMS[int(waveform_pos * len(self.WAVEFORMS))])
+        self.set_octave(int(octave_pos * 3) - 1)
+        self.set_fine_tune(cents)
+        self.set_amplitude(amp)
+        logger.info("%s parameters randomized.", self.name)
+
+    def get_available_waveforms(self) -> Tuple[str, ...]:
+        """利用可能な波形の一覧を返します。"""
         return self.WAVEFORMS
 
     def _cleanup(self):
@@ -196,3 +438,12 @@ class VCO(BaseModule):
         super()._cleanup()
         self.oscillator = None
         self.oscillators.clear()
+        self._freq_cache_key = None
+        self._freq_dirty = True
+        self._mip_tables = {}
+        self._active_tables = None
+        self._active_level = -1
+        self._reset_fn = None
+        self._last_amp = None
+        self.freq_signal = None
+        self._set_freq = None
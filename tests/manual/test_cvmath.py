@@ -3,9 +3,98 @@
 CVMath（CV演算）モジュールテスト
 """
 
+import time
+import threading
+
+import numpy as np
+from pyo import Pattern
+
 from test_utils import audio_server, TestModuleFactory, TestRunner, run_test, prompt_user, SignalType
 
 
+def record_cv_trace(read_values, num_values, n_steps, interval=0.5):
+    """
+    pyoのPatternでCV値を一定間隔で記録する（テスト側は最後の記録が終わるまで1回待機するだけ）
+
+    Args:
+        read_values: 記録する値のタプルを返す関数（数値以外はNaNとして記録）
+        num_values: read_valuesが返す値の数
+        n_steps: 記録回数
+        interval: 記録間隔（秒）
+
+    Returns:
+        (n_steps, num_values) の配列
+    """
+    trace = np.full((n_steps, num_values), np.nan, dtype=np.float32)
+    step = 0
+    finished = threading.Event()
+
+    def sample():
+        nonlocal step
+        if step >= n_steps:
+            return
+        for j, val in enumerate(read_values()):
+            if isinstance(val, (int, float)):
+                trace[step, j] = val
+        step += 1
+        if step >= n_steps:
+            finished.set()
+
+    pattern = Pattern(sample, time=interval).play()
+    # 最後の記録が書き込まれるまで待つ（サーバーが止まっている場合に備えて1周期以上の余裕を持たせたタイムアウト付き）
+    finished.wait((n_steps + 2) * interval)
+    pattern.stop()
+    return trace
+
+
+def _get_pyo_value(pyo_obj):
+    """PyoObjectの値を安全に取得（単一値の場合とリストの場合に対応。例外処理を使わず事前に判定する）"""
+    if pyo_obj is None:
+        return "N/A"
+    get = getattr(pyo_obj, "get", None)
+    if get is None:
+        return "N/A"
+    val = get()
+    if isinstance(val, list):
+        return val[0] if val else "N/A"
+    return val
+
+
+def _format_val(val):
+    """数値フォーマット（N/Aの場合、記録できなかった値（NaN）の場合はN/Aと表示）"""
+    if isinstance(val, (int, float)):
+        return "N/A" if np.isnan(val) else f"{val:.3f}"
+    return str(val)
+
+
+def _read_cv_values(sources):
+    """
+    各モジュールの出力値を取得
+
+    Args:
+        sources: (モジュール, 出力端子名) のシーケンス（演算の変更で出力オブジェクトが変わるため毎回参照する）
+    """
+    return tuple(_get_pyo_value(module.outputs.get(port)) for module, port in sources)
+
+
+def _format_cv_values(labels, values):
+    return "    数値監視 - " + ", ".join(f"{label}: {_format_val(val)}" for label, val in zip(labels, values))
+
+
+def _print_cv_values(labels, sources):
+    """CV値を1回取得して表示"""
+    try:
+        print(_format_cv_values(labels, _read_cv_values(sources)))
+    except Exception as e:
+        print(f"    CV値監視エラー: {e}")
+
+
+def _print_cv_trace(labels, sources, n_steps):
+    """監視中は記録のみ行い、終了後にまとめて表示"""
+    trace = record_cv_trace(lambda: _read_cv_values(sources), len(sources), n_steps)
+    print("\n".join(_format_cv_values(labels, row.tolist()) for row in trace))
+
+
 def test_cvmath_basic_operations():
     """基本的な演算テスト: 四則演算の確認"""
     with audio_server() as s:
@@ -30,34 +119,9 @@ def test_cvmath_basic_operations():
 
         runner.process_chain("cv_math", "vco", "vca")
 
-        # CV値の数値監視機能を追加
-        def print_cv_values_basic():
-            try:
-                # outputsディクショナリから正しくCV値を取得
-                lfo1_cv = lfo1.outputs.get("cv_out")
-                lfo2_cv = lfo2.outputs.get("cv_out")
-                cv_result_obj = cv_math.outputs.get("output")
-                
-                # PyoObjectの値を安全に取得（単一値の場合とリストの場合に対応）
-                def get_pyo_value(pyo_obj):
-                    if not pyo_obj or not hasattr(pyo_obj, 'get'):
-                        return "N/A"
-                    try:
-                        val = pyo_obj.get()
-                        return val[0] if isinstance(val, (list, tuple)) and len(val) > 0 else val
-                    except (IndexError, TypeError):
-                        return "N/A"
-                
-                lfo1_val = get_pyo_value(lfo1_cv)
-                lfo2_val = get_pyo_value(lfo2_cv)
-                cv_result = get_pyo_value(cv_result_obj)
-                # 数値フォーマット（N/Aの場合はそのまま表示）
-                def format_val(val):
-                    return f"{val:.3f}" if isinstance(val, (int, float)) else str(val)
-                
-                print(f"    数値監視 - LFO1: {format_val(lfo1_val)}, LFO2: {format_val(lfo2_val)}, CV演算結果: {format_val(cv_result)}")
-            except Exception as e:
-                print(f"    CV値監視エラー: {e}")
+        # CV値の数値監視対象
+        cv_labels = ("LFO1", "LFO2", "CV演算結果")
+        cv_sources = ((lfo1, "cv_out"), (lfo2, "cv_out"), (cv_math, "output"))
 
         # 音声出力
         runner.output_audio("vca", 0)
@@ -65,12 +129,9 @@ def test_cvmath_basic_operations():
         print("  加算演算: LFO1(0.2Hz, 200) + LFO2(3Hz, 100)")
         print("    期待する音: ゆっくりとした大きな変化 + 細かい高速変化")
         
-        # リアルタイム連続監視（0.5秒間隔で6秒間）
-        import time
-        print("    リアルタイム数値監視開始...")
-        for i in range(12):  # 6秒間、0.5秒間隔
-            print_cv_values_basic()
-            time.sleep(0.5)
+        # 連続監視（0.5秒間隔で6秒間記録し、終了後にまとめて表示）
+        print("    数値監視開始...")
+        _print_cv_trace(cv_labels, cv_sources, 12)
         print("    監視終了")
 
         print("  減算演算: LFO1 - LFO2 -> 異なる相互作用パターン")
@@ -80,9 +141,7 @@ def test_cvmath_basic_operations():
         
         # 減算演算の短時間監視（2秒間）
         print("    減算演算の2秒間監視...")
-        for i in range(4):  # 2秒間、0.5秒間隔
-            print_cv_values_basic()
-            time.sleep(0.5)
+        _print_cv_trace(cv_labels, cv_sources, 4)
         print("    残り4秒間の音響効果確認中...")
         time.sleep(4)
 
@@ -91,7 +150,7 @@ def test_cvmath_basic_operations():
         cv_math.set_operation("multiply")
         cv_math.set_scale(0.1)  # 乗算結果は大きくなりがちなので小さくする
         cv_math.process()
-        print_cv_values_basic()
+        _print_cv_values(cv_labels, cv_sources)
         runner.play_for(6)
 
         print("  極端なテスト: LFO1単体の効果確認")
@@ -103,7 +162,7 @@ def test_cvmath_basic_operations():
         lfo2.set_amplitude(0.1)  # ほぼゼロ
         lfo2.process()
         cv_math.process()
-        print_cv_values_basic()
+        _print_cv_values(cv_labels, cv_sources)
         runner.play_for(4)
 
         runner.cleanup()
@@ -237,37 +296,12 @@ def test_cvmath_dual_vco_control():
 
         runner.process_chain("cv_normal", "cv_inverted", "vco1", "vco2", "vca1", "vca2")
 
-        # CV値の数値監視機能を追加
-        def print_cv_values():
-            try:
-                # outputsディクショナリから正しくCV値を取得
-                lfo_cv = lfo.outputs.get("cv_out")
-                cv_normal_obj = cv_normal.outputs.get("output")
-                cv_inverted_obj = cv_inverted.outputs.get("output")
-                
-                # PyoObjectの値を安全に取得（単一値の場合とリストの場合に対応）
-                def get_pyo_value(pyo_obj):
-                    if not pyo_obj or not hasattr(pyo_obj, 'get'):
-                        return "N/A"
-                    try:
-                        val = pyo_obj.get()
-                        return val[0] if isinstance(val, (list, tuple)) and len(val) > 0 else val
-                    except (IndexError, TypeError):
-                        return "N/A"
-                
-                # 数値フォーマット（N/Aの場合はそのまま表示）
-                def format_val(val):
-                    return f"{val:.3f}" if isinstance(val, (int, float)) else str(val)
-                
-                lfo_val = get_pyo_value(lfo_cv)
-                cv_normal_val = get_pyo_value(cv_normal_obj)
-                cv_inverted_val = get_pyo_value(cv_inverted_obj)
-                print(f"    数値監視 - LFO: {format_val(lfo_val)}, CV_normal: {format_val(cv_normal_val)}, CV_inverted: {format_val(cv_inverted_val)}")
-            except Exception as e:
-                print(f"    CV値監視エラー: {e}")
+        # CV値の数値監視対象
+        cv_labels = ("LFO", "CV_normal", "CV_inverted")
+        cv_sources = ((lfo, "cv_out"), (cv_normal, "output"), (cv_inverted, "output"))
 
         print("  VCO1のみ出力テスト (440Hz + LFO変調)")
-        print_cv_values()
+        _print_cv_values(cv_labels, cv_sources)
         runner.output_audio("vca1", 0)
         runner.play_for(3)
 
@@ -275,7 +309,7 @@ def test_cvmath_dual_vco_control():
         # VCA1のゲインを0にして無音化（out_to_channel(-1)の代替）
         vca1.set_gain(0)
         vca1.process()
-        print_cv_values()
+        _print_cv_values(cv_labels, cv_sources)
         runner.output_audio("vca2", 0)
         runner.play_for(3)
 
@@ -283,7 +317,7 @@ def test_cvmath_dual_vco_control():
         cv_normal.set_scale(3.0)
         cv_inverted.set_scale(-3.0)
         runner.process_chain("cv_normal", "cv_inverted")
-        print_cv_values()
+        _print_cv_values(cv_labels, cv_sources)
 
         print("  VCO1 (3倍変調)")
         # VCA2のゲインを0、VCA1のゲインを復元
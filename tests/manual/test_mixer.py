@@ -3,8 +3,11 @@
 Mixer（ミキシング）モジュールテスト
 """
 
+import logging
 from test_utils import audio_server, TestModuleFactory, TestRunner, run_test, prompt_user
 
+logger = logging.getLogger(__name__)
+
 
 def test_mixer_basic_chord():
     """基本的な和音テスト: 3つのVCO -> Mixer -> VCA"""
@@ -30,19 +33,18 @@ def test_mixer_basic_chord():
         mixer.set_input_level(2, 0.3)  # E
         mixer.set_master_level(0.6)
 
-        print("  デバッグ: 各モジュールの状態を確認")
-        print(f"  VCO1 出力: {vco1.outputs.get('audio_out')}")
-        print(f"  VCO2 出力: {vco2.outputs.get('audio_out')}")
-        print(f"  VCO3 出力: {vco3.outputs.get('audio_out')}")
-        print(f"  Mixer 出力: {mixer.outputs.get('output')}")
-        print(f"  VCA 出力: {vca.outputs.get('audio_out')}")
+        # デバッグ: 各モジュールの状態を確認（DEBUGレベルのときのみ出力）
+        logger.debug("VCO1 出力: %s", vco1.outputs.get("audio_out"))
+        logger.debug("VCO2 出力: %s", vco2.outputs.get("audio_out"))
+        logger.debug("VCO3 出力: %s", vco3.outputs.get("audio_out"))
+        logger.debug("Mixer 出力: %s", mixer.outputs.get("output"))
+        logger.debug("VCA 出力: %s", vca.outputs.get("audio_out"))
 
         runner.process_chain("mixer", "vca")
         runner.output_audio("vca", 0)
 
-        print("  process()後の状態:")
-        print(f"  Mixer 出力: {mixer.outputs.get('output')}")
-        print(f"  VCA 出力: {vca.outputs.get('audio_out')}")
+        logger.debug("process()後の Mixer 出力: %s", mixer.outputs.get("output"))
+        logger.debug("process()後の VCA 出力: %s", vca.outputs.get("audio_out"))
 
         print("  A major triad (A-C#-E) 和音出力中")
         runner.play_for(3)
@@ -50,8 +52,7 @@ def test_mixer_basic_chord():
         print("  レベル調整: C#を強調")
         mixer.set_input_level(0, 0.2)  # A を小さく
         mixer.set_input_level(1, 0.5)  # C# を大きく
-        mixer.set_input_level(2, 0.3)  # E はそのまま
-        mixer.process()
+        mixer.set_input_level(2, 0.3)  # E はそのまま（レベルは動作中のMixに即座に反映される）
         runner.play_for(3)
 
         runner.cleanup()
@@ -138,25 +139,16 @@ def test_mixer_rhythmic_pattern():
         runner.process_chain("mixer", "vcf", "vca")
         runner.output_audio("vca", 0)
 
+        # レベル変更は動作中のMixに即座に反映されるため、再生中に2秒ごとに実行する
         print("  ベースのみ")
-        runner.play_for(2)
-
-        print("  リード追加")
-        mixer.set_input_level(1, 0.4)
-        runner.process_chain("mixer", "vcf", "vca")
-        runner.play_for(2)
-
-        print("  ノイズ追加（パーカッション風）")
-        mixer.set_input_level(2, 0.2)
-        runner.process_chain("mixer", "vcf", "vca")
-        runner.play_for(2)
-
-        print("  ベースを減らしてリードを強調")
-        mixer.set_input_level(0, 0.3)
-        mixer.set_input_level(1, 0.6)
-        mixer.set_input_level(2, 0.1)
-        runner.process_chain("mixer", "vcf", "vca")
-        runner.play_for(2)
+        runner.schedule_at(2, print, "  リード追加")
+        runner.schedule_at(2, mixer.set_input_level, 1, 0.4)
+        runner.schedule_at(4, print, "  ノイズ追加（パーカッション風）")
+        runner.schedule_at(4, mixer.set_input_level, 2, 0.2)
+        runner.schedule_at(6, print, "  ベースを減らしてリードを強調")
+        for i, level in enumerate((0.3, 0.6, 0.1)):
+            runner.schedule_at(6, mixer.set_input_level, i, level)
+        runner.play_for(8)
 
         runner.cleanup()
         return True
@@ -218,7 +210,6 @@ def test_mixer_stereo_spread():
         mixer_right.set_input_level(1, 0.3)
         mixer_right.set_input_level(2, 0.1)
 
-        runner.process_chain("mixer_left", "mixer_right", "vca_left", "vca_right")
         runner.play_for(4)
 
         runner.cleanup()
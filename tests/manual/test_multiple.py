@@ -6,8 +6,9 @@ Multiple（分岐）モジュールテスト
 import logging
 from test_utils import audio_server, TestModuleFactory, TestRunner, run_test, prompt_user, SignalType
 
-# デバッグ用にログレベルを設定
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+# デバッグ用にログレベルを設定（test_utilsでbasicConfig済みのため、ルートロガーのレベルを変更する）
+logging.getLogger().setLevel(logging.DEBUG)
+logger = logging.getLogger(__name__)
 
 
 def test_multiple_basic():
@@ -35,19 +36,14 @@ def test_multiple_basic():
         mixer.set_input_level(0, 0.6)  # VCF1(1000Hz)を強調
         mixer.set_input_level(1, 0.4)  # VCF2(2000Hz)を弱く
 
-        # 信号フロー順に処理：Multiple → 接続更新 → VCF × 2 → Mixer → VCA
-        runner.process_chain("mult")  # 信号分岐を適用
-        
-        # Multipleの新しい出力をVCFに反映するため接続を更新
-        runner.cm.update_all_connections()
-        
-        runner.process_chain("vcf1", "vcf2")  # VCFで信号を受信・処理
-        runner.process_chain("mixer", "vca")  # Mixerから後を処理
+        # 信号フロー順に処理：Multiple → VCF × 2 → Mixer → VCA
+        # （Multipleの出力オブジェクトは固定なので、分岐後に接続を更新する必要はない）
+        runner.process_chain("mult", "vcf1", "vcf2", "mixer", "vca")
 
         # デバッグ: Multipleの出力状態をチェック
-        print(f"  DEBUG: Multiple outputs: {mult.outputs}")
-        print(f"  DEBUG: Mixer inputs: {mixer.inputs}")
-        print(f"  DEBUG: VCA inputs: {vca.inputs}")
+        logger.debug("Multiple outputs: %s", mult.outputs)
+        logger.debug("Mixer inputs: %s", mixer.inputs)
+        logger.debug("VCA inputs: %s", vca.inputs)
 
         # モノラル出力（Mixerで既にブレンドされている）
         runner.output_audio("vca", 0)
@@ -59,7 +55,7 @@ def test_multiple_basic():
         print("  フィルター周波数を動的に変更")
         vcf1.set_frequency(500)
         vcf2.set_frequency(3000)
-        runner.process_chain("vcf1", "vcf2", "mixer")
+        runner.process_chain("vcf1", "vcf2")
         runner.play_for(3)
 
         runner.cleanup()
@@ -141,19 +137,14 @@ def test_multiple_fan_out():
         mixer.set_input_level(2, 0.2)  # 高域
         mixer.set_input_level(3, 0.2)  # 直接
 
-        # 信号フロー順に処理：Multiple → 接続更新 → VCF × 3 + VCA → Mixer → VCA
-        runner.process_chain("mult")  # 信号分岐を適用
-        
-        # Multipleの新しい出力を中間モジュールに反映するため接続を更新
-        runner.cm.update_all_connections()
-        
-        runner.process_chain("vcf1", "vcf2", "vcf3", "vca_direct")  # 中間処理
-        runner.process_chain("mixer", "vca_out")  # Mixerから後を処理
+        # 信号フロー順に処理：Multiple → VCF × 3 + VCA → Mixer → VCA
+        # （Multipleの出力オブジェクトは固定なので、分岐後に接続を更新する必要はない）
+        runner.process_chain("mult", "vcf1", "vcf2", "vcf3", "vca_direct", "mixer", "vca_out")
 
         # デバッグ: Multipleの出力状態をチェック
-        print(f"  DEBUG: Multiple outputs: {mult.outputs}")
-        print(f"  DEBUG: VCO output: {vco.outputs}")
-        print(f"  DEBUG: Mixer inputs: {mixer.inputs}")
+        logger.debug("Multiple outputs: %s", mult.outputs)
+        logger.debug("VCO output: %s", vco.outputs)
+        logger.debug("Mixer inputs: %s", mixer.inputs)
 
         # 音声出力
         runner.output_audio("vca_out", 0)
@@ -166,8 +157,7 @@ def test_multiple_fan_out():
         mixer.set_input_level(0, 0.6)  # 低域を強調
         mixer.set_input_level(1, 0.1)
         mixer.set_input_level(2, 0.1)
-        mixer.set_input_level(3, 0.2)
-        mixer.process()
+        mixer.set_input_level(3, 0.2)  # レベルは動作中のMixに即座に反映される
         runner.play_for(3)
 
         runner.cleanup()
@@ -1,18 +1,23 @@
 #!/usr/bin/env python3
 """
 手動テスト用の共通ユーティリティ
+
+環境変数 TEST_PLAY_SCALE を設定すると、play_for / schedule_at の時間をその倍率で短縮・延長します
+（例: TEST_PLAY_SCALE=0.25 で再生時間を1/4にする。未設定時は1.0）。
 """
 
 import sys
 import os
-import time
+import atexit
 import logging
+import threading
 from contextlib import contextmanager
 from pyo import Server
 
 # srcディレクトリをパスに追加
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from src.connection import ConnectionManager, SignalType
+from src.modules.base_module import reset_shared
 from src.modules.vco import VCO
 from src.modules.vca import VCA
 from src.modules.vcf import VCF
@@ -24,21 +29,58 @@ from src.modules.cvmath import CVMath
 
 # ログ設定
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+# play_for / schedule_atの時間に掛ける倍率（自動実行・プロファイリング時に再生時間を短縮するため）
+_PLAY_SCALE = float(os.environ.get("TEST_PLAY_SCALE", "1.0"))
+
+# 起動済みのPyoサーバーと、その設定 (channels, buffersize)
+_SERVER = None
+_SERVER_CONFIG = None
+
+# audio_server()の中で作成され、まだ後始末していないTestRunner
+_ACTIVE_RUNNERS = []
+
+
+def _shutdown_server():
+    """起動済みのPyoサーバーをシャットダウン（プロセス終了時にも呼ばれる）"""
+    global _SERVER, _SERVER_CONFIG
+    if _SERVER is None:
+        return
+    _SERVER.stop()
+    _SERVER.shutdown()
+    reset_shared()
+    _SERVER = None
+    _SERVER_CONFIG = None
+
+
+atexit.register(_shutdown_server)
 
 
 @contextmanager
 def audio_server(channels=2, buffersize=512):
     """
     Pyoサーバーのコンテキストマネージャー
+    サーバーの起動は最初の1回だけ行い、テスト間ではstart()/stop()のみ行う（シャットダウンはプロセス終了時）。
     """
-    s = Server(nchnls=channels, buffersize=buffersize, duplex=0)
-    s.boot()
-    s.start()
+    global _SERVER, _SERVER_CONFIG
+    config = (channels, buffersize)
+    if _SERVER is not None and _SERVER_CONFIG != config:
+        _shutdown_server()
+    if _SERVER is None:
+        _SERVER = Server(nchnls=channels, buffersize=buffersize, duplex=0)
+        _SERVER.boot()
+        _SERVER_CONFIG = config
+
+    _SERVER.start()
     try:
-        yield s
+        yield _SERVER
     finally:
-        s.stop()
-        s.shutdown()
+        # テストが途中で失敗しても、次のテストに音が残らないようモジュールを停止する
+        while _ACTIVE_RUNNERS:
+            _ACTIVE_RUNNERS.pop().cleanup()
+        _SERVER.stop()
 
 
 class TestModuleFactory:
@@ -101,6 +143,14 @@ class TestRunner:
         self.name = name
         self.cm = ConnectionManager()
         self.modules = {}
+        # process_chainに渡されたモジュール名のタプル -> 接続の上流から順に並べたモジュール名のタプル
+        self._chains = {}
+        # _chainsを作成した時点のConnectionManagerのバージョン（接続が変わったら作り直す）
+        self._chains_version = None
+        # play_forの再生終了を通知するイベントと、次のplay_for中に実行する (秒, 関数, 引数) のリスト
+        self._playing = threading.Event()
+        self._scheduled = []
+        _ACTIVE_RUNNERS.append(self)
 
     def add_module(self, name, module):
         """モジュールを追加して登録・開始"""
@@ -113,25 +163,106 @@ class TestRunner:
         """モジュールを接続"""
         self.cm.connect(source, source_port, target, target_port, signal_type)
 
+    def _build_chain(self, module_names):
+        """
+        モジュール名を接続の上流から順に並べる（省略時はConnectionManagerに登録された全モジュール）
+        指定されたモジュール同士が（他のモジュールを経由しても）接続されていなければ指定した順序を保つ
+        """
+        if not module_names:
+            return tuple(name for stage in self.cm.get_processing_stages() for name in stage)
+
+        names = tuple(dict.fromkeys(module_names))
+        downstream = {}
+        for conn in self.cm.get_all_connections():
+            if conn.source_module != conn.target_module:
+                downstream.setdefault(conn.source_module, set()).add(conn.target_module)
+
+        # 指定されたモジュールごとに、その上流にある指定モジュールを求める
+        upstream = {name: set() for name in names}
+        for name in names:
+            reached = set()
+            stack = [name]
+            while stack:
+                for target in downstream.get(stack.pop(), ()):
+                    if target not in reached:
+                        reached.add(target)
+                        stack.append(target)
+            for target in reached:
+                if target in upstream and target != name:
+                    upstream[target].add(name)
+
+        # 上流がすべて並んだモジュールのうち指定順で最初のものを選ぶ（循環している場合は指定順）
+        chain = []
+        remaining = list(names)
+        while remaining:
+            placed = set(chain)
+            name = next((name for name in remaining if upstream[name] <= placed), remaining[0])
+            chain.append(name)
+            remaining.remove(name)
+        return tuple(chain)
+
     def process_chain(self, *module_names):
-        """指定されたモジュールをチェーン順にprocess"""
-        print(f"  PROCESS_CHAIN: Processing modules: {module_names}")
-        for name in module_names:
-            if name in self.modules:
-                print(f"  PROCESS_CHAIN: Processing {name}")
-                self.modules[name].process()
-            else:
-                print(f"  PROCESS_CHAIN: WARNING - Module {name} not found!")
+        """
+        モジュールを接続の上流から順にprocess
+        モジュール名を指定した場合はそのモジュールだけを処理する（接続されていないモジュール同士は指定した順序）
+        """
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        if debug_enabled:
+            logger.debug("PROCESS_CHAIN: Processing modules: %s", module_names or "all")
+        # 処理順はConnectionManagerの接続が変わるまで再利用する
+        if self._chains_version != self.cm.version:
+            self._chains.clear()
+            self._chains_version = self.cm.version
+        chain = self._chains.get(module_names)
+        if chain is None:
+            chain = self._chains[module_names] = self._build_chain(module_names)
+        # モジュールは毎回self.modulesから引く（差し替えられた場合も反映される）
+        modules = self.modules
+        for name in chain:
+            module = modules.get(name)
+            if module is None:
+                logger.warning("PROCESS_CHAIN: Module %s not found!", name)
+                continue
+            if debug_enabled:
+                logger.debug("PROCESS_CHAIN: Processing %s", name)
+            module.process()
 
     def output_audio(self, module_name, channel=0):
         """指定されたモジュールから音声を出力"""
         if module_name in self.modules:
             self.modules[module_name].out_to_channel(channel)
 
+    def schedule_at(self, seconds, func, *args):
+        """
+        次のplay_forの再生開始からseconds秒後にfunc(*args)を実行するよう予約
+        レベル変更などを再生の合間ではなく再生中に行うために使う（再生時間を過ぎた予約は実行せず、警告を出して破棄する）
+        """
+        self._scheduled.append((seconds, func, args))
+
     def play_for(self, seconds):
-        """指定された秒数だけ音声を再生"""
-        print(f"  {seconds}秒間再生中...")
-        time.sleep(seconds)
+        """指定された秒数だけ音声を再生（schedule_atで予約した処理は再生中にタイマースレッドから実行）"""
+        print(f"  {seconds * _PLAY_SCALE:g}秒間再生中...")
+        timers = []
+        for at, func, args in self._scheduled:
+            if at < seconds:
+                timers.append(threading.Timer(at * _PLAY_SCALE, func, args))
+            else:
+                logger.warning(
+                    "%s: %s秒後の予約 %s は再生時間(%s秒)を過ぎるため破棄しました", self.name, at, func, seconds
+                )
+        self._scheduled.clear()
+        timers.append(threading.Timer(seconds * _PLAY_SCALE, self._playing.set))
+
+        self._playing.clear()
+        for timer in timers:
+            timer.daemon = True
+            timer.start()
+        try:
+            self._playing.wait()
+        finally:
+            # 中断された場合に予約が残らないよう取り消す
+            for timer in timers:
+                timer.cancel()
 
     def cleanup(self):
         """全モジュールを停止"""
@@ -155,6 +286,20 @@ def run_test(test_name, test_func):
         return False
 
 
+def warmup_dsp():
+    """
+    VCOの全波形が使う共有テーブル（サイン波・帯域制限テーブル・ノイズ源）を事前に作成
+    最初のテストや波形の切り替え中にテーブル作成の時間がかからないようにする（audio_server()の中で呼び出すこと）
+    """
+    vco = VCO(name="warmup_vco")
+    vco.start()
+    for waveform in VCO.WAVEFORMS:
+        vco.set_waveform(waveform)
+        vco.process()
+    # 共有テーブルはreset_shared()まで残るため、VCO自体は停止してよい
+    vco.stop()
+
+
 def prompt_user(message):
     """ユーザーにプロンプトを表示"""
     input(f"\n{message} (Enter を押して続行...)")
@@ -3,7 +3,8 @@
 VCO->VCA接続テスト (リファクタリング版)
 """
 
-from test_utils import audio_server, TestModuleFactory, TestRunner, run_test, prompt_user, SignalType
+import numpy as np
+from test_utils import audio_server, TestModuleFactory, TestRunner, run_test, prompt_user, warmup_dsp, SignalType
 
 
 def test_basic_vco_vca_connection():
@@ -34,28 +35,26 @@ def test_vco_waveforms():
     with audio_server() as s:
         runner = TestRunner("VCO Waveforms")
 
+        # モジュールは一度だけ作成・接続し、波形だけを切り替える
+        vco = runner.add_module("vco", TestModuleFactory.create_vco(waveform=waveforms[0]))
+        vca = runner.add_module("vca", TestModuleFactory.create_vca())
+
+        runner.connect("vco", "audio_out", "vca", "audio_in")
+        runner.process_chain("vca")
+        runner.output_audio("vca", 0)
+
         for waveform in waveforms:
             print(f"\n  テスト中: {waveform} 波形")
 
-            # モジュール作成
-            vco = runner.add_module("vco", TestModuleFactory.create_vco(waveform=waveform))
-            vca = runner.add_module("vca", TestModuleFactory.create_vca())
-
-            # 接続とプロセス
-            runner.connect("vco", "audio_out", "vca", "audio_in")
-            runner.process_chain("vca")
+            vco.set_waveform(waveform)
+            vco.process()
+            # 波形を切り替えるとVCOの出力オブジェクトが変わるため、VCAの入力に再適用する
+            runner.cm.update_all_connections()
+            vca.process()
 
-            # 音声出力
-            runner.output_audio("vca", 0)
             runner.play_for(2)
 
-            # モジュール停止
-            vco.stop()
-            vca.stop()
-
-            # 新しいテストのために辞書をクリア
-            runner.modules.clear()
-
+        runner.cleanup()
         return True
 
 
@@ -75,8 +74,7 @@ def test_vca_gain_control():
 
         for gain in gains:
             print(f"\n  ゲイン設定: {gain}")
-            vca.set_gain(gain)
-            vca.process()
+            vca.set_gain(gain)  # gain_cv未接続のため、process()なしで即座に反映される
             runner.play_for(2)
 
         runner.cleanup()
@@ -88,17 +86,20 @@ def test_multichannel_output():
     with audio_server() as s:
         runner = TestRunner("Multichannel Output")
 
-        # 4つのVCO-VCAペアを作成
-        for i in range(4):
-            freq = 220 * (2 ** (i * 0.25))  # 4分音階
-            vco = runner.add_module(
-                f"vco_{i}", TestModuleFactory.create_vco(name=f"vco_{i}", freq=freq, amplitude=0.3)
-            )
-            vca = runner.add_module(f"vca_{i}", TestModuleFactory.create_vca(name=f"vca_{i}", gain=0.6))
-
-            runner.connect(f"vco_{i}", "audio_out", f"vca_{i}", "audio_in")
-            runner.process_chain(f"vca_{i}")
-            runner.output_audio(f"vca_{i}", i % 2)  # 0と1チャンネルに交互配置
+        # 4つのVCO-VCAペアを作成（周波数は4分音階、モジュール名とあわせて事前に作成）
+        num_pairs = 4
+        freqs = (220.0 * np.exp2(np.arange(num_pairs) * 0.25)).tolist()
+        vco_names = [f"vco_{i}" for i in range(num_pairs)]
+        vca_names = [f"vca_{i}" for i in range(num_pairs)]
+        for freq, vco_name, vca_name in zip(freqs, vco_names, vca_names):
+            runner.add_module(vco_name, TestModuleFactory.create_vco(name=vco_name, freq=freq, amplitude=0.3))
+            runner.add_module(vca_name, TestModuleFactory.create_vca(name=vca_name, gain=0.6))
+            runner.connect(vco_name, "audio_out", vca_name, "audio_in")
+
+        # すべて接続してから、全VCAを1回のprocess_chainで処理する（処理順の構築も1回で済む）
+        runner.process_chain(*vca_names)
+        for i, vca_name in enumerate(vca_names):
+            runner.output_audio(vca_name, i % 2)  # 0と1チャンネルに交互配置
 
         print("  4つの異なる音程を2チャンネルで再生")
         runner.play_for(5)
@@ -122,6 +123,10 @@ def main():
     passed = 0
     total = len(tests)
 
+    # 共有波形テーブルを事前に作成（サーバーは起動したままなので、各テストのaudio_server()でも再利用される）
+    with audio_server():
+        warmup_dsp()
+
     for test_name, test_func in tests:
         prompt_user(f"{test_name}を実行します")
         if run_test(test_name, test_func):